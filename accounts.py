@@ -0,0 +1,160 @@
+# accounts.py
+
+import glob
+import math
+import os
+import time
+
+# Calls each account may start per minute (token bucket refill rate) and how
+# many it may start at once after being idle (bucket capacity). 0 = no limit (default).
+ACCOUNT_RATE_PER_MINUTE = float(os.environ.get("ACCOUNT_RATE_PER_MINUTE", 0))
+ACCOUNT_BURST = int(os.environ.get("ACCOUNT_BURST", 5))
+
+# Email reveals each account may do per ACCOUNT_CREDIT_PERIOD seconds. 0 = no limit.
+ACCOUNT_EMAIL_CREDITS = int(os.environ.get("ACCOUNT_EMAIL_CREDITS", 0))
+ACCOUNT_CREDIT_PERIOD = int(os.environ.get("ACCOUNT_CREDIT_PERIOD", 24 * 3600))
+
+# How long a throttled account stays out of rotation, in seconds.
+ACCOUNT_THROTTLE_COOLDOWN = int(os.environ.get("ACCOUNT_THROTTLE_COOLDOWN", 300))
+
+# Scraper methods that spend an email credit.
+EMAIL_OPERATIONS = {"get_email"}
+
+
+def load_accounts(cookies):
+    """
+    Returns one Account per cookies file. `cookies` is a cookies file, a
+    directory (every *.json file in it) or a comma-separated list of files.
+    Accounts are named after their file.
+    """
+    if os.path.isdir(cookies):
+        paths = sorted(glob.glob(os.path.join(cookies, "*.json")))
+    else:
+        paths = [path.strip() for path in cookies.split(",") if path.strip()]
+    if not paths:
+        raise ValueError(f"No cookies file found in '{cookies}'.")
+    return [Account(os.path.splitext(os.path.basename(path))[0], path) for path in paths]
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, and up to `capacity` at once."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class Account:
+    """
+    An Apollo account (one cookies file) with its rate limit, email credit
+    budget and health. Not thread-safe: ScraperPool uses it under its lock.
+
+    An account leaves the rotation for ACCOUNT_THROTTLE_COOLDOWN seconds when
+    Apollo throttles it, and until its cookies file changes when its session
+    expires.
+    """
+
+    def __init__(self, name, cookies_file_path, rate_per_minute=ACCOUNT_RATE_PER_MINUTE, burst=ACCOUNT_BURST,
+                 email_credits=ACCOUNT_EMAIL_CREDITS, credit_period=ACCOUNT_CREDIT_PERIOD):
+        self.name = name
+        self.cookies_file_path = cookies_file_path
+        self.bucket = TokenBucket(rate_per_minute / 60, burst) if rate_per_minute else None
+        self.email_credits = email_credits
+        self.credit_period = credit_period
+        self.credits_used = 0
+        self.period_started_at = time.time()
+        self.throttled_until = 0
+        self.throttle_count = 0
+        self.logged_out = False
+        self.logged_out_mtime = None
+        self.drivers = 0
+        self.in_flight = 0
+        self.calls = 0
+
+    def _cookies_mtime(self):
+        try:
+            return os.path.getmtime(self.cookies_file_path)
+        except OSError:
+            return None
+
+    def is_logged_out(self):
+        """True until the cookies file is replaced after the session expired."""
+        if self.logged_out and self._cookies_mtime() != self.logged_out_mtime:
+            self.logged_out = False
+        return self.logged_out
+
+    def credits_left(self):
+        """Email reveals left in the current period (None without a budget)."""
+        if not self.email_credits:
+            return None
+        if time.time() - self.period_started_at >= self.credit_period:
+            self.period_started_at = time.time()
+            self.credits_used = 0
+        return self.email_credits - self.credits_used
+
+    def unavailable_for(self, operation):
+        """
+        Seconds before the account can start `operation` (a scraper method
+        name): 0 if it can now, math.inf if it is logged out.
+        """
+        if self.is_logged_out():
+            return math.inf
+        waits = [self.throttled_until - time.time()]
+        if operation in EMAIL_OPERATIONS and self.credits_left() is not None and self.credits_left() <= 0:
+            waits.append(self.period_started_at + self.credit_period - time.time())
+        if self.bucket:
+            waits.append(self.bucket.wait_time())
+        return max(0, *waits)
+
+    def load(self):
+        """Share of the account's drivers that are busy, used to pick the least loaded account."""
+        return self.in_flight / max(1, self.drivers)
+
+    def reserve(self, operation):
+        """Spends a rate token (and an email credit for reveals) for a call about to start."""
+        if self.bucket:
+            self.bucket.acquire()
+        if operation in EMAIL_OPERATIONS and self.credits_left() is not None:
+            self.credits_used += 1
+        self.calls += 1
+
+    def mark_throttled(self, cooldown=ACCOUNT_THROTTLE_COOLDOWN):
+        self.throttled_until = time.time() + cooldown
+        self.throttle_count += 1
+
+    def mark_logged_out(self):
+        self.logged_out = True
+        self.logged_out_mtime = self._cookies_mtime()
+
+    def stats(self):
+        if self.is_logged_out():
+            status = "logged_out"
+        elif self.throttled_until > time.time():
+            status = "throttled"
+        else:
+            status = "active"
+        return {
+            "name": self.name,
+            "status": status,
+            "drivers": self.drivers,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "throttled": self.throttle_count,
+            "email_credits_left": self.credits_left(),
+        }
@@ -2,21 +2,384 @@
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.service import Service
 from webdriver_manager.firefox import GeckoDriverManager
-from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException
+from result_cache import profile_id_from_url
+from telemetry import CONTACTS_PER_PAGE, FAILURES, PAGES_PER_SCRAPE, SCREENSHOTS, configure_logging, span
+from urllib.parse import quote, urlencode, urlparse
 
+import functools
 import json
+import logging
+import os
+import shutil
+import signal
 import time
 
+logger = logging.getLogger(__name__)
+
+# Extracts every row of the results table in a single round trip.
+# The selectors are relative to `#table-row-{i}`; the loop stops at the first
+# missing row, which marks the end of the page.
+EXTRACT_ROWS_SCRIPT = """
+const rows = [];
+for (let i = 0; ; i++) {
+    const row = document.getElementById('table-row-' + i);
+    if (!row) break;
+    const nameElement = row.querySelector(':scope > div.zp_biVWr.zp_wDB4y > div:nth-child(2) > div > div > a');
+    if (!nameElement) break;
+    const jobTitleElement = row.querySelector(':scope > div:nth-child(2) > div > div > div.zp_YGDgt > span > span');
+    const companyElement = row.querySelector(':scope > div:nth-child(3) > div > div > div > span > div > div > div > div.zp_PaniY > a > span');
+    const emailButton = row.querySelector(':scope > div:nth-child(4) > div > span > button');
+    rows.push({
+        name: nameElement.innerText.trim(),
+        name_link: nameElement.href,
+        job_title: jobTitleElement ? jobTitleElement.innerText.trim() : '',
+        company: companyElement ? companyElement.innerText.trim() : null,
+        email_state: emailButton ? emailButton.getAttribute('data-tour-id') : null,
+    });
+}
+return rows;
+"""
+
+# Link of the first row, used to detect that a new page of results has rendered.
+FIRST_ROW_SIGNATURE_SCRIPT = """
+const nameElement = document.querySelector('#table-row-0 > div.zp_biVWr.zp_wDB4y > div:nth-child(2) > div > div > a');
+return nameElement ? nameElement.href : null;
+"""
+
+# Identifies the email/reveal button elements currently rendered (tagging them
+# on first sight), used to detect that a new profile has rendered after an
+# in-app navigation. Returns null when neither is shown.
+PROFILE_SIGNATURE_SCRIPT = """
+const xpaths = arguments[0];
+const nodes = [xpaths.revealedEmail, xpaths.emailButton]
+    .map(xpath => document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue)
+    .filter(Boolean);
+if (!nodes.length) return null;
+window.__scraperNodeSeq = window.__scraperNodeSeq || 0;
+return nodes.map(node => node.__scraperToken || (node.__scraperToken = ++window.__scraperNodeSeq)).join(',');
+"""
+
+# Upper bound for the readiness waits that replace fixed sleeps.
+READY_TIMEOUT = 10
+
+# Known page elements
+BLOCKING_ELEMENT_XPATH = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div/div[3]/div[2]/div[2]/div/div/div/div/div/div"
+BUTTON_IF_BLOCKED_SELECTOR = "#main-container-column-2 > div > div > div > div.zp_p234g.people-finder-shell-container.people-finder-shell-empty-state-shown > div.zp_pxYrj > div.zp_FWOdG > div > div > div.zp_pDn5b.zp_T8qTB.zp_w3MDk > div:nth-child(4) > div.zp-accordion-header.zp_r3aQ1.zp_JoE0E > span > button"
+EMAIL_BUTTON_XPATH = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div[2]/div/div/div/div/div[2]/div[1]/div[1]/div[1]/div/div[2]/div/div/div[1]/div[2]/div[1]/div[2]/button"
+REVEALED_EMAIL_XPATH = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div/div[2]/div/div[1]/div/div/div[2]/div[1]/div[1]/div[1]/div/div[2]/div/div/div[1]/div[2]/div/div/div[1]/div/div/div[2]/div/div/div[1]/div/div/div/div/div/div[1]/a"
+
+# Page states reported by PAGE_STATE_SCRIPT
+PAGE_STATE_RESULTS = "results"
+PAGE_STATE_BLOCKED = "blocked"
+PAGE_STATE_EMPTY = "empty"
+PAGE_STATE_LOGIN = "login"
+PAGE_STATE_EMAIL_REVEALED = "email_revealed"
+PAGE_STATE_REVEAL_BUTTON = "reveal_button"
+PAGE_STATE_LOADING = "loading"
+
+# Time given to an in-app navigation to replace the previous profile before
+# get_email falls back to reloading the page.
+PROFILE_RENDER_TIMEOUT = 3
+
+# States that are final as soon as they are seen. "empty" is also shown
+# briefly while results load, so it must hold for PAGE_STATE_SETTLE seconds.
+FINAL_PAGE_STATES = {PAGE_STATE_LOGIN, PAGE_STATE_BLOCKED}
+PAGE_STATE_SETTLE = 0.5
+
+# Tells, in one evaluation, which known state the page is in.
+PAGE_STATE_SCRIPT = """
+const xpaths = arguments[0];
+function byXpath(xpath) {
+    return document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+if (location.hash.indexOf('#/login') === 0 || document.querySelector('input[type="password"]')) return 'login';
+if (document.getElementById('table-row-0')) return 'results';
+if (byXpath(xpaths.blocking)) return 'blocked';
+if (byXpath(xpaths.revealedEmail)) return 'email_revealed';
+if (byXpath(xpaths.emailButton)) return 'reveal_button';
+if (document.querySelector('.people-finder-shell-empty-state-shown')) return 'empty';
+return 'loading';
+"""
+
+# Root URL of the Apollo app. Can point to a local stand-in (see bench/mock_apollo.py).
+APOLLO_BASE_URL = os.environ.get("APOLLO_BASE_URL", "https://app.apollo.io").rstrip("/")
+
+# Text shown by Apollo when an account sends too many requests (regular
+# expression, case-insensitive), checked after a failed call.
+THROTTLE_TEXT_PATTERN = os.environ.get("THROTTLE_TEXT_PATTERN", "too many requests|rate limit|slow down")
+
+# Tells whether the page shows that the account is rate limited.
+THROTTLE_SCRIPT = """
+if (window.__apolloThrottled) return true;
+return new RegExp(arguments[0], 'i').test(document.body ? document.body.innerText : '');
+"""
+
+# Default number of contacts after which a domain scrape stops paginating.
+CONTACT_LIMIT = 100
+
+# Default number of people returned by a name search.
+PEOPLE_LIMIT = 25
+
+# Apollo shows 25 results per page; a shorter page is the last one.
+PAGE_SIZE = 25
+
+# Job titles searched by scrape_apollo when the caller does not give any.
+DEFAULT_PERSON_TITLES = [
+    "it manager",
+    "project manager",
+    "talent acquisition",
+    "rh",
+    "senior",
+    "developer",
+    "ceo",
+    "cto",
+    "business manager",
+    "ingenieur d'affaires",
+]
+
+# Search URL parameter filtering people by company domain (the one Apollo's
+# "Company" filter adds to the URL).
+ORGANIZATION_DOMAINS_PARAM = "qOrganizationDomainsList[]"
+
+# Extraction engine: "dom" reads the rendered table, "network" reads the JSON
+# responses of Apollo's API captured in the page (see NETWORK_HOOK_SCRIPT).
+EXTRACTION_ENGINE = os.environ.get("EXTRACTION_ENGINE", "dom")
+
+# Wraps fetch and XMLHttpRequest so the JSON bodies of Apollo API responses
+# are kept in `window.__apolloCapture`, and a 429 answer sets
+# `window.__apolloThrottled`. Installing it twice is a no-op.
+NETWORK_HOOK_SCRIPT = """
+if (window.__apolloCapture) { return true; }
+window.__apolloCapture = [];
+const MAX_CAPTURED = 50;
+function record(url, text, status) {
+    if (!url || String(url).indexOf('/api/v1/') === -1) return;
+    if (status === 429) window.__apolloThrottled = true;
+    try {
+        window.__apolloCapture.push({url: String(url), body: JSON.parse(text)});
+        if (window.__apolloCapture.length > MAX_CAPTURED) window.__apolloCapture.shift();
+    } catch (e) {}
+}
+const originalFetch = window.fetch;
+window.fetch = function() {
+    return originalFetch.apply(this, arguments).then(function(response) {
+        response.clone().text().then(function(text) { record(response.url, text, response.status); }).catch(function() {});
+        return response;
+    });
+};
+const originalOpen = XMLHttpRequest.prototype.open;
+XMLHttpRequest.prototype.open = function(method, url) {
+    this.__apolloUrl = url;
+    return originalOpen.apply(this, arguments);
+};
+const originalSend = XMLHttpRequest.prototype.send;
+XMLHttpRequest.prototype.send = function() {
+    this.addEventListener('load', function() {
+        const url = this.responseURL || this.__apolloUrl;
+        if (this.responseType === 'json') record(url, JSON.stringify(this.response), this.status);
+        else if (this.responseType === '' || this.responseType === 'text') record(url, this.responseText, this.status);
+    });
+    return originalSend.apply(this, arguments);
+};
+return true;
+"""
+
+# Removes and returns the captured responses whose URL contains arguments[0].
+COLLECT_RESPONSES_SCRIPT = """
+const pattern = arguments[0];
+const captured = window.__apolloCapture || [];
+window.__apolloCapture = captured.filter(function(entry) { return entry.url.indexOf(pattern) === -1; });
+return captured.filter(function(entry) { return entry.url.indexOf(pattern) !== -1; });
+"""
+
+SEARCH_API_PATH = "/api/v1/mixed_people/search"
+
+# Local geckodriver binary. When unset, the one on PATH is used, and only if there
+# is none is it downloaded with webdriver-manager.
+GECKODRIVER_PATH = os.environ.get("GECKODRIVER_PATH")
+
+# Directory holding one persistent Firefox profile per worker. The profiles keep
+# the authenticated Apollo session, so cookies are only injected when missing.
+FIREFOX_PROFILE_DIR = os.environ.get("FIREFOX_PROFILE_DIR")
+
+# Lean mode: no images, media or web fonts, third-party trackers blocked, small
+# caches and an "eager" page load strategy. Enabled unless SCRAPER_LEAN_MODE=0.
+LEAN_MODE = os.environ.get("SCRAPER_LEAN_MODE", "1") != "0"
+
+# Third-party hosts resolved to localhost in lean mode (through Firefox's
+# network.dns.localDomains), so their requests fail immediately. Extra hosts
+# can be added with SCRAPER_BLOCKED_HOSTS (comma separated).
+BLOCKED_HOSTS = [
+    "www.google-analytics.com",
+    "google-analytics.com",
+    "www.googletagmanager.com",
+    "googletagmanager.com",
+    "stats.g.doubleclick.net",
+    "connect.facebook.net",
+    "snap.licdn.com",
+    "px.ads.linkedin.com",
+    "bat.bing.com",
+    "widget.intercom.io",
+    "js.intercomcdn.com",
+    "api-iam.intercom.io",
+    "nexus-websocket-a.intercom.io",
+    "static.hotjar.com",
+    "script.hotjar.com",
+    "cdn.segment.com",
+    "api.segment.io",
+    "cdn.heapanalytics.com",
+    "heapanalytics.com",
+    "js.hs-scripts.com",
+    "js.hs-analytics.net",
+    "js.hs-banner.com",
+    "edge.fullstory.com",
+    "rs.fullstory.com",
+    "cdn.amplitude.com",
+    "api2.amplitude.com",
+    "browser.sentry-cdn.com",
+    "static.zdassets.com",
+    "www.youtube.com",
+    "player.vimeo.com",
+] + [host.strip() for host in os.environ.get("SCRAPER_BLOCKED_HOSTS", "").split(",") if host.strip()]
+
+LEAN_MODE_PREFERENCES = {
+    # Images, media and fonts
+    "permissions.default.image": 2,
+    "media.autoplay.default": 5,
+    "media.autoplay.blocking_policy": 2,
+    "media.peerconnection.enabled": False,
+    "gfx.downloadable_fonts.enabled": False,
+    "browser.display.use_document_fonts": 0,
+    # Trackers
+    "privacy.trackingprotection.enabled": True,
+    "privacy.trackingprotection.socialtracking.enabled": True,
+    "network.dns.localDomains": ",".join(BLOCKED_HOSTS),
+    # Cache and session history memory
+    "browser.cache.disk.enable": False,
+    "browser.cache.memory.capacity": 65536,
+    "browser.sessionhistory.max_entries": 3,
+    "browser.sessionhistory.max_total_viewers": 0,
+    "browser.sessionstore.max_tabs_undo": 0,
+    "browser.sessionstore.resume_from_crash": False,
+    # Background traffic
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "datareporting.healthreport.uploadEnabled": False,
+    "toolkit.telemetry.enabled": False,
+}
+
+# Placeholder returned by Apollo for emails that have not been revealed.
+LOCKED_EMAIL_SUFFIX = "email_not_unlocked@domain.com"
+
+
+def build_people_search_url(page=1, keywords=None, organization_domains=None, person_titles=None,
+                            prospected_by_current_team=None, sort_by="recommendations_score", sort_ascending=False,
+                            base_url=APOLLO_BASE_URL):
+    """Builds the URL of an Apollo people search, so a results page is reached with one navigation."""
+    params = [("page", page)]
+    for title in person_titles or []:
+        params.append(("personTitles[]", title))
+    for domain in organization_domains or []:
+        params.append((ORGANIZATION_DOMAINS_PARAM, domain))
+    if prospected_by_current_team:
+        params.append(("prospectedByCurrentTeam[]", prospected_by_current_team))
+    params.append(("sortAscending", "true" if sort_ascending else "false"))
+    params.append(("sortByField", sort_by))
+    if keywords:
+        params.append(("qKeywords", keywords))
+    return f"{base_url}/#/people?{urlencode(params, quote_via=quote, safe='[]')}"
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_geckodriver_path():
+    """Returns the geckodriver to use, resolved once per process."""
+    path = GECKODRIVER_PATH or shutil.which("geckodriver")
+    if path:
+        logger.info("GeckoDriver local utilisé: %s", path)
+        return path
+    path = GeckoDriverManager().install()
+    logger.info("GeckoDriver installed automatically with webdriver-manager")
+    return path
+
+
+def parse_people_response(payload, base_url=APOLLO_BASE_URL):
+    """
+    Converts a people search response into rows shaped like extract_page_rows'.
+    Fields the table does not show are returned under "details".
+    """
+    rows = []
+    for record in (payload.get("contacts") or []) + (payload.get("people") or []):
+        person_id = record.get("person_id") or record.get("id")
+        organization = record.get("organization") or {}
+        email_status = record.get("email_status")
+        rows.append({
+            "name": record.get("name") or " ".join(filter(None, [record.get("first_name"), record.get("last_name")])),
+            "name_link": f"{base_url}/#/people/{person_id}",
+            "job_title": record.get("title") or "",
+            "company": organization.get("name") or record.get("organization_name"),
+            # Same values as the data-tour-id of the table's email button
+            "email_state": f"email-cell-{email_status}" if email_status else None,
+            "details": {
+                "person_id": person_id,
+                "email_status": email_status,
+                "linkedin_url": record.get("linkedin_url"),
+                "seniority": record.get("seniority"),
+                "departments": record.get("departments"),
+                "city": record.get("city"),
+                "state": record.get("state"),
+                "country": record.get("country"),
+                "organization_id": organization.get("id") or record.get("organization_id"),
+                "organization_domain": organization.get("primary_domain"),
+                "organization_linkedin_url": organization.get("linkedin_url"),
+            },
+        })
+    return rows
+
+
+def find_revealed_email(payload, person_id):
+    """Returns the unlocked email of `person_id` found in an API response, or None."""
+    records = []
+    for key in ("contacts", "people", "matches"):
+        records.extend(payload.get(key) or [])
+    for key in ("contact", "person"):
+        if payload.get(key):
+            records.append(payload[key])
+
+    for record in records:
+        if person_id not in (record.get("id"), record.get("person_id")):
+            continue
+        email = record.get("email")
+        if email and not email.endswith(LOCKED_EMAIL_SUFFIX):
+            return email
+    return None
+
+class SessionExpiredError(Exception):
+    """The Apollo session is no longer valid (login page shown)."""
+
+
 class ApolloScraper:
-    def __init__(self, cookies_file_path):
+    def __init__(self, cookies_file_path, extraction_engine=EXTRACTION_ENGINE, lean_mode=LEAN_MODE, profile_dir=None,
+                 base_url=APOLLO_BASE_URL):
         self.cookies_file_path = cookies_file_path
+        self.base_url = base_url.rstrip("/")
+        self.extraction_engine = extraction_engine
+        self.lean_mode = lean_mode
+        self.profile_dir = profile_dir
         self.driver = None
+        # Lifecycle of the current driver, used by ScraperPool to decide when to recycle it
+        self.driver_started_at = None
+        self.jobs_since_start = 0
+        # False after a reload of the current search: its response may have been sent before the hook was reinstalled
+        self.search_response_expected = True
         
     def setup_driver(self):
         firefox_options = Options()
@@ -27,13 +390,23 @@ class ApolloScraper:
         firefox_options.set_preference("dom.webdriver.enabled", False)
         firefox_options.set_preference('useAutomationExtension', False)
         firefox_options.set_preference("general.useragent.override", "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/115.0")
+
+        if self.lean_mode:
+            # Les attentes explicites remplacent l'attente de l'événement "load"
+            firefox_options.page_load_strategy = "eager"
+            for name, value in LEAN_MODE_PREFERENCES.items():
+                firefox_options.set_preference(name, value)
+
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            firefox_options.add_argument("-profile")
+            firefox_options.add_argument(self.profile_dir)
         
         try:
-            service = Service(GeckoDriverManager().install())
+            service = Service(resolve_geckodriver_path())
             self.driver = webdriver.Firefox(service=service, options=firefox_options)
-            print("✅ GeckoDriver installed automatically with webdriver-manager")
         except Exception as e:
-            print(f"Erreur avec webdriver-manager: {e}")
+            logger.error("Erreur lors du démarrage de GeckoDriver: %s", e)
             raise Exception("Impossible d'initialiser GeckoDriver.")
         
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
@@ -44,353 +417,545 @@ class ApolloScraper:
                 cookies = json.load(f)
             return cookies
         except FileNotFoundError:
-            print(f"Erreur: Fichier de cookies '{self.cookies_file_path}' introuvable")
+            logger.error("Fichier de cookies '%s' introuvable", self.cookies_file_path)
             return None
         except json.JSONDecodeError:
-            print(f"Erreur: Format JSON invalide dans '{self.cookies_file_path}'")
+            logger.error("Format JSON invalide dans '%s'", self.cookies_file_path)
             return None
     
     def set_cookies(self, cookies):
         for cookie in cookies:
             try:
-                cookie_dict = {'name': cookie.get('name'), 'value': cookie.get('value'), 'domain': cookie.get('domain', '.apollo.io')}
+                cookie_dict = {'name': cookie.get('name'), 'value': cookie.get('value')}
+                # Sans domaine, le cookie est posé sur le domaine courant (utile hors apollo.io)
+                domain = cookie.get('domain', '.apollo.io' if urlparse(self.base_url).hostname.endswith('apollo.io') else None)
+                if domain: cookie_dict['domain'] = domain
                 if 'path' in cookie: cookie_dict['path'] = cookie['path']
                 if 'secure' in cookie: cookie_dict['secure'] = cookie['secure']
                 if 'httpOnly' in cookie: cookie_dict['httpOnly'] = cookie['httpOnly']
                 self.driver.add_cookie(cookie_dict)
             except Exception as e:
-                print(f"Erreur lors de l'ajout du cookie {cookie.get('name', 'inconnu')}: {e}")
+                logger.warning("Erreur lors de l'ajout du cookie %s: %s", cookie.get('name', 'inconnu'), e)
                 continue
     
+    def has_session_cookies(self, cookies):
+        """Returns True if the browser already holds every cookie of `cookies` (persistent profile)."""
+        present = {cookie["name"] for cookie in self.driver.get_cookies()}
+        return all(cookie.get("name") in present for cookie in cookies)
+
     def _initialize_driver_and_cookies(self):
         """Initializes the driver and sets cookies if not already done."""
         if self.driver is None:
-            self.setup_driver()
-            cookies = self.load_cookies()
-            
-            if cookies:
-                self.driver.get("https://app.apollo.io")
-                self.driver.maximize_window()
-                self.driver.set_window_size(1920, 1080)
+            with span("driver", "setup_driver"):
+                self.setup_driver()
+            self.driver_started_at = time.monotonic()
+            self.jobs_since_start = 0
+            with span("driver", "open_session"):
+                self.open_session()
+
+    def open_session(self):
+        """Opens the Apollo app in the current driver and authenticates it with the cookies."""
+        cookies = self.load_cookies()
+
+        if cookies or self.profile_dir:
+            self.driver.get(self.base_url)
+            self.driver.maximize_window()
+            self.driver.set_window_size(1920, 1080)
+            if not cookies:
+                logger.info("Pas de cookies, utilisation de la session du profil Firefox.")
+            elif self.has_session_cookies(cookies):
+                logger.info("Session déjà présente dans le profil Firefox, cookies non réinjectés.")
+            else:
                 self.set_cookies(cookies)
                 self.driver.refresh()
-            else:
-                raise Exception("Cookies could not be loaded.")
+        else:
+            raise Exception("Cookies could not be loaded.")
+
+    def warm_up(self):
+        """Starts the driver and opens the Apollo session ahead of the first request."""
+        self._initialize_driver_and_cookies()
 
-    def scrape_apollo(self, company_domain: str):
+    def is_driver_alive(self):
+        """Returns False if there is no driver or its browser/WebDriver session no longer answers."""
+        if self.driver is None:
+            return False
         try:
-            self._initialize_driver_and_cookies()
-            
-            target_url = "https://app.apollo.io/#/people?page=1&personTitles[]=it%20manager&personTitles[]=project%20manager&personTitles[]=talent%20acquisition&personTitles[]=rh&personTitles[]=senior&personTitles[]=developer&personTitles[]=ceo&personTitles[]=cto&personTitles[]=business%20manager&personTitles[]=ingenieur%20d%27affaires&prospectedByCurrentTeam[]=no&sortAscending=false&sortByField=recommendations_score&uniqueUrlId=4rhKtweaXd"
-            print(f"Navigation vers: {target_url}")
-            self.driver.get(target_url)
+            self.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def browser_pid(self):
+        """Returns the pid of the Firefox main process, or None if it is unknown."""
+        if self.driver is None:
+            return None
+        return self.driver.capabilities.get("moz:processID")
+
+    def save_error_screenshot(self, operation, prefix="screenshot"):
+        """Saves a screenshot of the current page for debugging and returns its path (None without a driver)."""
+        if not self.driver:
+            return None
+        screenshot_path = f"{prefix}_{time.time()}.png"
+        self.driver.save_screenshot(screenshot_path)
+        SCREENSHOTS.labels(operation).inc()
+        logger.info("Screenshot saved to %s", screenshot_path)
+        return screenshot_path
+
+    def wait_until_ready(self, condition, timeout=READY_TIMEOUT):
+        """
+        Waits until `condition(driver)` is truthy and returns its value as soon as
+        it is, or None once `timeout` seconds have passed.
+        """
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(condition)
+        except TimeoutException:
+            return None
+
+    def probe_page_state(self):
+        """Returns the current page state (one of the PAGE_STATE_* values) with a single script call."""
+        return self.driver.execute_script(PAGE_STATE_SCRIPT, {
+            "blocking": BLOCKING_ELEMENT_XPATH,
+            "revealedEmail": REVEALED_EMAIL_XPATH,
+            "emailButton": EMAIL_BUTTON_XPATH,
+        })
+
+    def wait_for_page_state(self, expected_states, timeout=READY_TIMEOUT, previous_signature=None, signature=None):
+        """
+        Waits until the page is in one of `expected_states` or in a final state
+        (login wall, blocking overlay, settled empty results) and returns that
+        state. Returns the last seen state if `timeout` expires first.
+
+        With `previous_signature`, the expected states only count once
+        `signature()` (first_row_signature by default) differs from it, i.e.
+        once a new page has rendered after navigation.
+        """
+        observed = {"state": PAGE_STATE_LOADING, "since": time.monotonic()}
+        signature = signature or self.first_row_signature
+
+        def state_reached(driver):
+            state = self.probe_page_state()
+            if state in expected_states and previous_signature is not None and signature() == previous_signature:
+                state = PAGE_STATE_LOADING
+            if state != observed["state"]:
+                observed.update(state=state, since=time.monotonic())
+            if state in expected_states or state in FINAL_PAGE_STATES:
+                return state
+            if state == PAGE_STATE_EMPTY and time.monotonic() - observed["since"] >= PAGE_STATE_SETTLE:
+                return state
+            return None
+
+        return self.wait_until_ready(state_reached, timeout) or observed["state"]
+
+    def is_logged_out(self):
+        """Returns True if the page shows Apollo's login wall (False if the driver cannot tell)."""
+        try:
+            return self.driver is not None and self.probe_page_state() == PAGE_STATE_LOGIN
+        except Exception:
+            return False
+
+    def is_throttled(self):
+        """Returns True if Apollo answered with a rate limit (False if the driver cannot tell)."""
+        try:
+            return self.driver is not None and bool(self.driver.execute_script(THROTTLE_SCRIPT, THROTTLE_TEXT_PATTERN))
+        except Exception:
+            return False
+
+    def first_row_signature(self):
+        """Returns the profile link of the first result row, or None if there is no row."""
+        return self.driver.execute_script(FIRST_ROW_SIGNATURE_SCRIPT)
+
+    def profile_signature(self):
+        """Returns a token identifying the email/reveal elements shown, or None if there are none."""
+        return self.driver.execute_script(PROFILE_SIGNATURE_SCRIPT, {
+            "revealedEmail": REVEALED_EMAIL_XPATH,
+            "emailButton": EMAIL_BUTTON_XPATH,
+        })
+
+    def open_profile_page(self, url, timeout=7):
+        """
+        Navigates to a profile URL and returns the page state once its email or
+        reveal button is shown (or a final state). Profile URLs only differ by
+        their hash, so this is an in-app navigation; the page is only reloaded
+        if the previous profile is still shown after PROFILE_RENDER_TIMEOUT.
+        """
+        expected_states = {PAGE_STATE_REVEAL_BUTTON, PAGE_STATE_EMAIL_REVEALED}
+        previous_signature = self.profile_signature() if self.driver.current_url != url else None
+        self.driver.get(url)
+        self.install_network_hook()
+        if previous_signature is None:
+            return self.wait_for_page_state(expected_states, timeout)
+
+        state = self.wait_for_page_state(expected_states, PROFILE_RENDER_TIMEOUT, previous_signature=previous_signature, signature=self.profile_signature)
+        if state in expected_states or state in FINAL_PAGE_STATES:
+            return state
+        logger.info("Profil précédent toujours affiché, rechargement de la page.")
+        self.driver.refresh()
+        self.install_network_hook()
+        return self.wait_for_page_state(expected_states, timeout)
+
+    def open_results_page(self, url, timeout=READY_TIMEOUT):
+        """
+        Navigates to a people search URL and returns the page state once its
+        results (or a final state) are shown. Search URLs only differ by their
+        hash, so this is an in-app navigation: the previous table stays in the
+        DOM until the new results replace it. When the URL is already the
+        current one, no search request would be sent, so the page is reloaded
+        and its rows are read from the table.
+        """
+        previous_signature = self.first_row_signature()
+        previous_url = self.driver.current_url
+        self.search_response_expected = True
+        if self.extraction_engine == "network":
+            self.install_network_hook()
+            self.collect_responses(SEARCH_API_PATH)
+        self.driver.get(url)
+        if self.driver.current_url == previous_url:
+            # Même recherche déjà affichée: rechargement pour des résultats frais
             self.driver.refresh()
-            wait = WebDriverWait(self.driver, 5)
-            
-            print("Clic sur le premier élément...")
-            first_element_xpath = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div/div[3]/div[2]/div[1]/div/div/div[2]/div[5]/div"
-            first_element = wait.until(EC.element_to_be_clickable((By.XPATH, first_element_xpath)))
-            first_element.click()
-            
-            # --- MODIFIÉ : Attente explicite pour le chargement du champ de recherche ---
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".Select-placeholder")))
-            
-            print("Clic sur le deuxième élément (le placeholder)...")
-            placeholder_css = ".Select-placeholder"
-            second_element = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, placeholder_css)))
-            second_element.click()
-            time.sleep(0.5)
-            
-            print(f"Envoi des touches pour le domaine: {company_domain}...")
-
-            actions = ActionChains(self.driver)
-            actions.send_keys(company_domain)
-            actions.perform()
-            
-            # --- MODIFIÉ : Attente pour la suggestion de domaine avant d'appuyer sur Entrée ---
-            time.sleep(3)
-            print("send return ...")
-            actions.send_keys(Keys.RETURN)
-            actions.perform()            
-            blocking_element_xpath = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div/div[3]/div[2]/div[2]/div/div/div/div/div/div"
-            button_if_blocked_selector = "#main-container-column-2 > div > div > div > div.zp_p234g.people-finder-shell-container.people-finder-shell-empty-state-shown > div.zp_pxYrj > div.zp_FWOdG > div > div > div.zp_pDn5b.zp_T8qTB.zp_w3MDk > div:nth-child(4) > div.zp-accordion-header.zp_r3aQ1.zp_JoE0E > span > button"
+            self.install_network_hook()
+            self.search_response_expected = False
+            previous_signature = None
+        return self.wait_for_page_state({PAGE_STATE_RESULTS}, timeout, previous_signature=previous_signature)
+
+    def install_network_hook(self):
+        """Starts capturing Apollo API responses in the current document (network engine only)."""
+        if self.extraction_engine == "network":
+            self.driver.execute_script(NETWORK_HOOK_SCRIPT)
+
+    def collect_responses(self, url_pattern):
+        """Removes and returns the JSON bodies captured for URLs containing `url_pattern`."""
+        captured = self.driver.execute_script(COLLECT_RESPONSES_SCRIPT, url_pattern) or []
+        return [entry["body"] for entry in captured]
+
+    def wait_for_responses(self, url_pattern, timeout=READY_TIMEOUT):
+        """Waits until at least one response matching `url_pattern` is captured and returns them."""
+        return self.wait_until_ready(lambda driver: self.collect_responses(url_pattern), timeout) or []
+
+    def wait_for_revealed_email(self, person_id, timeout=READY_TIMEOUT):
+        """Waits for an API response carrying the unlocked email of `person_id` and returns it, or None."""
+        def email_revealed(driver):
+            for payload in self.collect_responses("/api/v1/"):
+                email = find_revealed_email(payload, person_id)
+                if email:
+                    return email
+            return None
 
+        return self.wait_until_ready(email_revealed, timeout)
 
-            try:
-                # On essaie de trouver directement la table de résultats
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table-row-0")))
-            except:
-                # Si la table n'est pas là, on vérifie si c'est à cause de l'élément bloquant
-                blocking_elements = self.driver.find_elements(By.XPATH, blocking_element_xpath)
-
-                if len(blocking_elements) > 0:
-                    print("Élément bloquant détecté. Tentative de clic sur le bouton pour continuer...")
-                    try:
-                        button_to_click = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, button_if_blocked_selector)))
-                        button_to_click.click()
-                        print("Clic sur le bouton de contournement effectué. Attente du chargement des résultats...")
-                        # On attend que la table apparaisse après le clic
-                        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table-row-0")))
-                    except Exception as e:
-                        # Si le clic échoue, on lève une exception pour arrêter proprement
-                        screenshot_path = f"screenshot_{time.time()}.png"
-                        if self.driver:
-                            self.driver.save_screenshot(screenshot_path)
-                            print(f"Screenshot saved to {screenshot_path}")
-                        raise Exception(f"Impossible de cliquer sur le bouton de contournement. Erreur: {e}")
-                else:
-                    # AMÉLIORATION : Si la table ET l'élément bloquant sont absents, on arrête.
-                    print("ERREUR : La table de résultats est absente, et l'élément bloquant connu n'a pas été trouvé non plus.")
-                    screenshot_path = f"screenshot_{time.time()}.png"
-                    if self.driver:
-                        self.driver.save_screenshot(screenshot_path)
-                        print(f"Screenshot saved to {screenshot_path}")
-                    raise Exception("État de la page inconnu, impossible de continuer le scraping.")
-
-            
-            # --- FIN DE LA NOUVELLE LOGIQUE ---
-
-
-            # --- MODIFIÉ : Attente explicite du rechargement de la page après l'action ---
-            
-            
-
-            # --- NOUVELLE LOGIQUE D'EXTRACTION AVEC PAGINATION ET JSON STRUCTURÉ ---
-            print("Extraction des contacts de la page...")
+    def extract_page_rows(self):
+        """
+        Extracts all rows of the current results page with one JavaScript call.
+        Returns a list of dicts (name, name_link, job_title, company, email_state).
+
+        With the network engine, rows come from the last captured search response
+        and also carry a "details" dict; if no response was captured, or the
+        page was reloaded by open_results_page, the rendered table is read instead.
+        """
+        if self.extraction_engine == "network" and self.search_response_expected:
+            responses = self.wait_for_responses(SEARCH_API_PATH)
+            if responses:
+                return parse_people_response(responses[-1], self.base_url)
+            logger.warning("Aucune réponse de recherche capturée, extraction depuis le tableau.")
+        return self.driver.execute_script(EXTRACT_ROWS_SCRIPT) or []
+
+    def scrape_apollo(self, company_domain: str, limit: int = CONTACT_LIMIT, person_titles=None, checkpoint=None, incremental=False, resume=True):
+        """
+        Scrape les contacts d'un domaine et les retourne sous forme de liste,
+        ou None en cas d'erreur.
+
+        With a `checkpoint` (checkpoints.Checkpoint), every page is saved as
+        soon as it is extracted, and a scrape that failed earlier resumes after
+        its last saved page (unless `resume` is False, for fresh results). With
+        `incremental`, a domain scraped completely before is only walked up to
+        the first page holding an already known contact; the new contacts are
+        put in front of the known ones.
+        """
+        try:
             contacts = []
-            CONTACT_LIMIT = 100
-            
+            known_contacts = []
+            start_page = 1
+            saved = checkpoint.load() if checkpoint else None
+            if saved and not saved["finished"] and resume:
+                contacts = saved["contacts"]
+                start_page = saved["last_page"] + 1
+                logger.info("Reprise du scraping de %s à la page %s (%s contacts déjà extraits).", company_domain, start_page, len(contacts))
+            elif saved and saved["finished"] and incremental:
+                known_contacts = saved["contacts"]
+                logger.info("Mise à jour incrémentale de %s (%s contacts connus).", company_domain, len(known_contacts))
+            stop_at_links = {contact["name_link"] for contact in known_contacts} or None
+
+            with span("scrape", "total"):
+                if len(contacts) < limit:
+                    pages = self.iter_scrape_apollo(company_domain, limit - len(contacts), person_titles, start_page=start_page, stop_at_links=stop_at_links)
+                    for page, page_contacts in enumerate(pages, start=start_page):
+                        contacts.extend(page_contacts)
+                        if checkpoint:
+                            checkpoint.save_page(page, page_contacts)
+
+            new_links = {contact["name_link"] for contact in contacts}
+            contacts.extend(contact for contact in known_contacts if contact["name_link"] not in new_links)
+            # The oldest known contacts make room for the new ones, so refreshes never return more than `limit`
+            contacts = contacts[:limit]
+            for index, contact in enumerate(contacts):
+                contact["id"] = index
+            if checkpoint:
+                checkpoint.finish(contacts)
+            logger.info("%s contacts extraits au total pour %s.", len(contacts), company_domain)
+            return contacts
+        except Exception:
+            # L'erreur a déjà été affichée (avec capture d'écran) par iter_scrape_apollo
+            return None
+
+    def iter_scrape_apollo(self, company_domain: str, limit: int = CONTACT_LIMIT, person_titles=None, start_page=1, stop_at_links=None):
+        """
+        Generator version of scrape_apollo: yields the contacts of each results
+        page as soon as it is extracted, until `limit` contacts have been
+        yielded or pagination ends. Errors are raised (after a screenshot).
+
+        Each page is opened directly from its search URL (domain filter, titles,
+        sort order and page number), without interacting with the filters UI.
+        Pagination starts at `start_page`, and stops after the first page
+        holding a profile link of `stop_at_links` (those contacts are left out).
+        """
+        state = None
+        try:
+            self._initialize_driver_and_cookies()
+            wait = WebDriverWait(self.driver, 5)
+            if person_titles is None:
+                person_titles = DEFAULT_PERSON_TITLES
+
+            logger.info("Extraction des contacts du domaine %s...", company_domain)
+            contact_count = 0
+            page = start_page
+
             while True:
-                # Vérifier si la première ligne du tableau est présente
-                try:
-                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table-row-0")))
-                except:
-                    print("Aucune ligne de résultats trouvée.")
+                target_url = build_people_search_url(
+                    base_url=self.base_url,
+                    page=page,
+                    organization_domains=[company_domain],
+                    person_titles=person_titles,
+                    prospected_by_current_team="no",
+                )
+                logger.debug("Navigation vers: %s", target_url)
+
+                # Une seule sonde JavaScript indique l'état de la page au lieu d'attentes en cascade
+                with span("scrape", "navigation", page=page):
+                    state = self.open_results_page(target_url)
+                if state == PAGE_STATE_BLOCKED:
+                    logger.info("Élément bloquant détecté. Tentative de clic sur le bouton pour continuer...")
+                    with span("scrape", "unblock", page=page):
+                        try:
+                            button_to_click = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, BUTTON_IF_BLOCKED_SELECTOR)))
+                            button_to_click.click()
+                            logger.info("Clic sur le bouton de contournement effectué. Attente du chargement des résultats...")
+                        except Exception as e:
+                            # L'élément bloquant a pu disparaître entre-temps, on vérifie avant d'abandonner
+                            if self.probe_page_state() != PAGE_STATE_RESULTS:
+                                raise Exception(f"Impossible de cliquer sur le bouton de contournement. Erreur: {e}")
+                        state = self.wait_for_page_state({PAGE_STATE_RESULTS})
+
+                if state == PAGE_STATE_LOGIN:
+                    raise SessionExpiredError("Session Apollo expirée: page de connexion affichée.")
+                if state == PAGE_STATE_EMPTY:
+                    logger.info("Aucun résultat pour le domaine %s (page %s).", company_domain, page)
                     break
-                
+                if state != PAGE_STATE_RESULTS:
+                    if page > 1:
+                        # Page au-delà de la dernière (domaine avec un multiple de 25 résultats): on garde les contacts déjà extraits
+                        logger.info("Aucune ligne de résultats trouvée (page %s, état de la page: %s). Fin de la pagination.", page, state)
+                        break
+                    raise Exception(f"La table de résultats est absente (état de la page: {state}), impossible de continuer le scraping.")
+
                 # Récupérer l'URL de la page actuelle pour l'inclure dans les données
                 current_url = self.driver.current_url
-                company1_XPATH = f"#table-row-0 > div:nth-child(3) > div > div > div > span > div > div > div > div.zp_PaniY > a > span"
-                company2_XPATH = f"#table-row-1 > div:nth-child(3) > div > div > div > span > div > div > div > div.zp_PaniY > a > span"
-
-                company1_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, company1_XPATH)))
-                company2_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, company2_XPATH)))
-                if company1_element.text != company2_element.text:
-                    print("company1_element.text != company2_element.text")
-                    screenshot_path = f"screenshot_{time.time()}.png"
-                    if self.driver:
-                        self.driver.save_screenshot(screenshot_path)
-                        print(f"Screenshot saved to {screenshot_path}")
+
+                # Extraction de toutes les lignes de la page en un seul appel JavaScript
+                with span("scrape", "extraction", page=page):
+                    rows = self.extract_page_rows()
+                if len(rows) > 1 and rows[0]["company"] != rows[1]["company"]:
                     raise Exception("company1_element.text != company2_element.text")
-                    
-                    
-                
 
-                # Boucle pour itérer sur chaque ligne du tableau
-                i = 0
-                while True:
-                    try:
-                        # Construire les sélecteurs CSS pour le nom et le titre de poste
-                        name_selector = f"#table-row-{i} > div.zp_biVWr.zp_wDB4y > div:nth-child(2) > div > div > a"
-                        job_title_selector = f"#table-row-{i} > div:nth-child(2) > div > div > div.zp_YGDgt > span > span"
-                        email_selector = f"#table-row-{i} > div:nth-child(4) > div > span > button"
-
-                        # Attendre que les deux éléments soient présents et visibles
-                        name_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, name_selector)))
-                        job_title_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, job_title_selector)))
-                        
-                            
-                        
-                            
-                        # Récupérer le lien associé au nom
-                        name_link = name_element.get_attribute('href')
-
-                        # Trouver le bouton de l'e-mail et vérifier son attribut
-                        email_present = False
-                        try:
-                            email_button = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, email_selector)))
-                            
-                            # On vérifie la valeur de l'attribut data-tour-id
-                            data_tour_id = email_button.get_attribute("data-tour-id")
-                            
-                            if data_tour_id == "email-cell-verified" or data_tour_id == "email-cell-unverified":
-                                email_present = True
-                            
-                        except:
-                            # Si le bouton n'est même pas présent, l'e-mail n'est pas vérifié
-                            pass
-                        
-                        # Créer un dictionnaire pour le contact actuel
-                        contact = {
-                            "id": len(contacts),
-                            "name": name_element.text,
-                            "name_link": name_link,
-                            "job_title": job_title_element.text,
-                            "output_url": current_url,
-                            "company_domain": company_domain,
-                            "email_verified": email_present  # Utilisation d'un nom de champ plus précis
-
-                        }
-                        if email_present == True:
-                            contacts.append(contact)
-                        
-                        
-                        print(f"Extrait - ID: {contact['id']}, Nom: {contact['name']}, Titre: {contact['job_title']}, Email vérifié: {contact['email_verified']}")
-                        i += 1
-                    except:
-                        # Si l'élément n'est pas trouvé, cela signifie
-                        # que nous avons atteint la fin du tableau sur cette page
-                        print(f"Fin de l'extraction de la page. {i} contacts trouvés.")
-                        break
-                if len(contacts) >= CONTACT_LIMIT:
-                    print(f"Limite de {CONTACT_LIMIT} contacts atteinte. Arrêt de la pagination.")
+                page_contacts = []
+                known_on_page = False
+                for row in rows:
+                    if stop_at_links and row["name_link"] in stop_at_links:
+                        known_on_page = True
+                        continue
+                    email_present = row["email_state"] in ("email-cell-verified", "email-cell-unverified")
+
+                    # Créer un dictionnaire pour le contact actuel
+                    contact = {
+                        "id": contact_count + len(page_contacts),
+                        "name": row["name"],
+                        "name_link": row["name_link"],
+                        "job_title": row["job_title"],
+                        "output_url": current_url,
+                        "company_domain": company_domain,
+                        "email_verified": email_present  # Utilisation d'un nom de champ plus précis
+                    }
+                    if "details" in row:
+                        contact["details"] = row["details"]
+                    if email_present == True:
+                        page_contacts.append(contact)
+
+                    logger.debug("Extrait - ID: %s, Nom: %s, Titre: %s, Email vérifié: %s", contact['id'], contact['name'], contact['job_title'], contact['email_verified'])
+
+                i = len(rows)
+                logger.info("Fin de l'extraction de la page %s. %s contacts trouvés.", page, i)
+                CONTACTS_PER_PAGE.observe(len(page_contacts))
+                # La dernière page est tronquée pour ne jamais dépasser `limit` (streaming et cache compris)
+                page_contacts = page_contacts[:limit - contact_count]
+                contact_count += len(page_contacts)
+                yield page_contacts
+
+                if known_on_page:
+                    logger.info("Contacts déjà connus atteints (page %s). Arrêt de la pagination.", page)
+                    break
+
+                if contact_count >= limit:
+                    logger.info("Limite de %s contacts atteinte. Arrêt de la pagination.", limit)
                     break # Sort de la boucle externe (pagination)
 
                 # Vérifier s'il y a 25 contacts sur la page (indice 0 à 24)
-                if i < 25:
-                    print("Moins de 25 contacts sur la page. Fin de la pagination.")
-                    break
-                
-                # Clic sur le bouton "next"
-                try:
-                    next_button_selector = "#main-container-column-2 > div > div > div > div.zp_p234g.people-finder-shell-container > div.zp_pxYrj > div.zp_lYmVV > div.zp_DhjQ0.zp_a7xaB > div > div.zp_l0qux > button:nth-child(4)"
-                    next_button = wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, next_button_selector)))
-                    next_button.click()
-                    print("Clic sur le bouton 'Suivant'. Attente du chargement de la nouvelle page.")
-                    time.sleep(3) # Laisser le temps à la page de charger
-                except:
-                    print("Bouton 'Suivant' non trouvé ou non cliquable. Fin de la pagination.")
+                if i < PAGE_SIZE:
+                    logger.info("Moins de 25 contacts sur la page. Fin de la pagination.")
                     break
 
-            print(f"✅ {len(contacts)} contacts extraits au total.")
-            return contacts
-            
+                page += 1
+
+            PAGES_PER_SCRAPE.observe(page - start_page + 1)
+
         except Exception as e:
-            print(f"Erreur lors du scraping: {e}")
-            screenshot_path = f"screenshot_{time.time()}.png"
-            if self.driver:
-                self.driver.save_screenshot(screenshot_path)
-                print(f"Screenshot saved to {screenshot_path}")
-            return None
+            FAILURES.labels("scrape", state or "unknown").inc()
+            logger.error("Erreur lors du scraping de %s: %s", company_domain, e)
+            self.save_error_screenshot("scrape")
+            if not isinstance(e, SessionExpiredError) and self.is_logged_out():
+                raise SessionExpiredError("Session Apollo expirée: page de connexion affichée.") from e
+            raise
     
     
-    def get_people_by_name(self, name: str):
+    def get_people_by_name(self, name: str, limit: int = PEOPLE_LIMIT):
         """
         Recherche des personnes par nom et retourne les résultats sous forme de dictionnaire.
+        Les pages sont parcourues via le paramètre `page=N` de l'URL jusqu'à
+        `limit` personnes (dédoublonnées par name_link) ou une page incomplète.
         """
+        state = None
         try:
             self._initialize_driver_and_cookies()
-            time.sleep(2)
-            self.driver.get(f"https://app.apollo.io/#/people?page=1&sortAscending=false&sortByField=recommendations_score&qKeywords={name.split(' ')[0]}%20{name.split(' ')[1]}")
-            wait = WebDriverWait(self.driver, 15)
+            keywords = " ".join(name.split())
             people = []
-            while True:
-                try:
-                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "#table-row-0")))
-                except:
-                    print("Aucune ligne de résultats trouvée.")
+            seen_links = set()
+            page = 1
+            while len(people) < limit:
+                with span("people", "navigation", page=page):
+                    state = self.open_results_page(build_people_search_url(page=page, keywords=keywords, base_url=self.base_url), timeout=15)
+                if state == PAGE_STATE_LOGIN:
+                    raise SessionExpiredError("Session Apollo expirée: page de connexion affichée.")
+                if state != PAGE_STATE_RESULTS:
+                    logger.info("Aucune ligne de résultats trouvée (page %s, état de la page: %s).", page, state)
                     break
-                i = 0
-                while True:
-                    try:
-                        name_selector = f"#table-row-{i} > div.zp_biVWr.zp_wDB4y > div:nth-child(2) > div > div > a"
-                        job_title_selector = f"#table-row-{i} > div:nth-child(2) > div > div > div.zp_YGDgt > span > span"
-                        name_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, name_selector)))
-                        job_title_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, job_title_selector)))
-                        name_link = name_element.get_attribute('href')
-                        person = {
-                            "id": len(people),
-                            "name": name_element.text,
-                            "name_link": name_link,
-                            "job_title": job_title_element.text
-                        }
-                        people.append(person)
-                        print(f"Extrait - ID: {person['id']}, Nom: {person['name']}, Titre: {person['job_title']}")
-                        i += 1
-                    except:
-                        print(f"Fin de l'extraction de la page. {i} personnes trouvées.")
+
+                with span("people", "extraction", page=page):
+                    rows = self.extract_page_rows()
+                new_people = 0
+                for row in rows:
+                    if row["name_link"] in seen_links:
+                        continue
+                    seen_links.add(row["name_link"])
+                    person = {
+                        "id": len(people),
+                        "name": row["name"],
+                        "name_link": row["name_link"],
+                        "job_title": row["job_title"]
+                    }
+                    people.append(person)
+                    new_people += 1
+                    logger.debug("Extrait - ID: %s, Nom: %s, Titre: %s", person['id'], person['name'], person['job_title'])
+                    if len(people) >= limit:
                         break
+                logger.info("Fin de l'extraction de la page %s. %s personnes trouvées.", page, len(rows))
+
+                if len(rows) < PAGE_SIZE or new_people == 0:
+                    break
+                page += 1
             return people
         except Exception as e:
-            screenshot_path = f"screenshot_{time.time()}.png"
-            if self.driver:
-                self.driver.save_screenshot(screenshot_path)
-                print(f"Screenshot saved to {screenshot_path}")
-            print(f"Erreur lors de la recherche par nom: {e}")
+            FAILURES.labels("people", state or "unknown").inc()
+            self.save_error_screenshot("people")
+            logger.error("Erreur lors de la recherche par nom: %s", e)
             raise e
 
     def get_email(self, profile_url: str):
         """
         Navigue vers une URL de profil et tente d'extraire l'adresse e-mail.
         """
+        state = None
         try:
             self._initialize_driver_and_cookies()
-            self.driver.get(profile_url)
-            self.driver.refresh()
+            logger.info("Navigating to profile URL: %s", profile_url)
             wait = WebDriverWait(self.driver, 7)
 
-            print(f"Navigating to profile URL: {profile_url}")
-            
-
-            # Clic sur le bouton pour révéler l'e-mail
-            try:
-                email_button_xpath = '/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div[2]/div/div/div/div/div[2]/div[1]/div[1]/div[1]/div/div[2]/div/div/div[1]/div[2]/div[1]/div[2]/button'
-                email_button = wait.until(EC.presence_of_element_located((By.XPATH, email_button_xpath)))
-                email_button.click()
-                time.sleep(1) # Attendre que l'e-mail apparai2sse
-
-            except Exception:
-                # Extraire l'adresse e-mail
-                try:
-
-                    print("Bouton non trouvé, on extrait l'e-mail directement")
-                    email_selector = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div/div[2]/div/div[1]/div/div/div[2]/div[1]/div[1]/div[1]/div/div[2]/div/div/div[1]/div[2]/div/div/div[1]/div/div/div[2]/div/div/div[1]/div/div/div/div/div/div[1]/a"
-                    email_element = wait.until(EC.presence_of_element_located((By.XPATH, email_selector)))
-                    email = email_element.text
-                    print(f"✅ E-mail extrait: {email}")
-                    return {"status": "success", "email": email}
-
-                except Exception as e:
-
-                    print(f"Erreur lors de l'extraction de l'e-mail: {e}")
-                    # --- NOUVEAU: Capture d'écran pour le débogage ---2
-                    screenshot_path = f"email_error_screenshot_{time.time()}.png"
-                    if self.driver:
-                        self.driver.save_screenshot(screenshot_path)
-                        print(f"Screenshot saved to {screenshot_path}")
-                        
-                    raise e
-
-
+            with span("get_email", "navigation"):
+                # Une seule sonde indique si l'e-mail est déjà visible ou s'il faut le révéler
+                state = self.open_profile_page(profile_url)
+            if state == PAGE_STATE_LOGIN:
+                raise SessionExpiredError("Session Apollo expirée: page de connexion affichée.")
+
+            if state == PAGE_STATE_REVEAL_BUTTON:
+                with span("get_email", "reveal"):
+                    # Clic sur le bouton pour révéler l'e-mail
+                    email_button = wait.until(EC.presence_of_element_located((By.XPATH, EMAIL_BUTTON_XPATH)))
+                    email_button.click()
+
+                    if self.extraction_engine == "network":
+                        email = self.wait_for_revealed_email(profile_id_from_url(profile_url))
+                        if email:
+                            logger.info("E-mail extrait de la réponse réseau: %s", email)
+                            return {"status": "success", "email": email}
+                        logger.warning("E-mail absent des réponses capturées, extraction depuis la page.")
+            elif state == PAGE_STATE_EMAIL_REVEALED:
+                logger.info("Bouton non trouvé, on extrait l'e-mail directement")
+            else:
+                raise Exception(f"Ni l'e-mail ni le bouton de révélation trouvés (état de la page: {state}).")
 
             # Extraire l'adresse e-mail
-            email_selector = "/html/body/div[2]/div/div[2]/div[2]/div/div[2]/div/div[2]/div/div/div/div/div[2]/div/div[1]/div/div/div[2]/div[1]/div[1]/div[1]/div/div[2]/div/div/div[1]/div[2]/div/div/div[1]/div/div/div[2]/div/div/div[1]/div/div/div/div/div/div[1]/a"
-            email_element = wait.until(EC.presence_of_element_located((By.XPATH, email_selector)))
-            email = email_element.text
-            
-            print(f"✅ E-mail extrait: {email}")
+            with span("get_email", "extraction"):
+                email_element = wait.until(EC.presence_of_element_located((By.XPATH, REVEALED_EMAIL_XPATH)))
+                email = email_element.text
+
+            logger.info("E-mail extrait: %s", email)
             return {"status": "success", "email": email}
 
         except Exception as e:
-            print(f"Erreur lors de l'extraction de l'e-mail: {e}")
-            
-            # --- NOUVEAU: Capture d'écran pour le débogage ---
-            screenshot_path = f"email_error_screenshot_{time.time()}.png"
-            if self.driver:
-                self.driver.save_screenshot(screenshot_path)
-                print(f"Screenshot saved to {screenshot_path}")
-                
+            FAILURES.labels("get_email", state or "unknown").inc()
+            logger.error("Erreur lors de l'extraction de l'e-mail: %s", e)
+            # Capture d'écran pour le débogage
+            self.save_error_screenshot("get_email", prefix="email_error_screenshot")
             raise e
 
 
     def quit_driver(self):
-        """Quits the WebDriver instance."""
+        """Quits the WebDriver instance. A browser that does not quit cleanly (dead session) is killed."""
         if self.driver:
-            self.driver.quit()
-            self.driver = None
+            pid = self.browser_pid()
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning("Fermeture du driver impossible (%s), arrêt forcé de Firefox.", e)
+                if pid:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except OSError:
+                        pass
+            finally:
+                self.driver = None
+                self.driver_started_at = None
 
 
 if __name__ == "__main__":
+    # Interactive menu, one input at a time. For bulk runs, see cli.py.
+    configure_logging()
     cookies_file = "apollo_cookies.json"
     scraper = ApolloScraper(cookies_file)
     
@@ -413,7 +978,7 @@ if __name__ == "__main__":
         else:
             print("\n❌ Domaine invalide.")
     elif choice == "2":
-        profile_url = "https://app.apollo.io/#/people/6724c639258ded000196ec08?overrideScoreId=score"
+        profile_url = input("Entrez l'URL du profil (ex: https://app.apollo.io/#/people/...): ").strip()
         if profile_url:
             email_result = scraper.get_email(profile_url)
             print(json.dumps(email_result, indent=2))
@@ -427,6 +992,6 @@ if __name__ == "__main__":
         else:
             print("\n❌ Nom invalide.")
     else:
-        print("\n❌ Choix invalide. Veuillez relancer et entrer 1 ou 2.")
+        print("\n❌ Choix invalide. Veuillez relancer et entrer 1, 2 ou 3.")
     
     scraper.quit_driver()
@@ -1,22 +1,137 @@
 # app.py
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
-from apollo_scraper import ApolloScraper
+from typing import List, Optional
+from apollo_scraper import CONTACT_LIMIT, PEOPLE_LIMIT
+from checkpoints import CheckpointStore
+from jobs import JobScheduler
+from result_cache import ResultCache, profile_id_from_url, scrape_cache_key
+from scraper_pool import ScraperPool
+from telemetry import ACTIVE_DRIVERS, BUSY_WORKERS, QUEUE_DEPTH, REQUEST_SECONDS, configure_logging, request_id
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+# Leveled logs with the request id (LOG_LEVEL, LOG_FORMAT=text|json)
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Initialize the FastAPI app
 app = FastAPI()
 
-# Global scraper instance. It will be initialized once.
-# This avoids creating a new WebDriver for each request, which is very slow.
-scraper = ApolloScraper("apollo_cookies.json")
+# Global pool of scrapers, each with its own WebDriver. Drivers are created once
+# and reused, which avoids starting a new browser for each request (very slow).
+# The pool size is read from the SCRAPER_POOL_SIZE environment variable.
+# APOLLO_COOKIES_FILE may also be a directory or a comma-separated list of
+# cookies files, one per Apollo account (see accounts.py).
+COOKIES_FILE = os.environ.get("APOLLO_COOKIES_FILE", "apollo_cookies.json")
+pool = ScraperPool(COOKIES_FILE)
+
+# Pool gauges are read when /metrics is scraped
+ACTIVE_DRIVERS.set_function(lambda: pool.stats()["active_drivers"])
+BUSY_WORKERS.set_function(lambda: pool.stats()["busy"])
+QUEUE_DEPTH.set_function(lambda: pool.stats()["queue_depth"])
+
+# Persistent result cache in front of the scraper (SQLite file, see CACHE_PATH).
+cache = ResultCache()
+SCRAPE_CACHE_TTL = int(os.environ.get("SCRAPE_CACHE_TTL", 7 * 24 * 3600))
+EMAIL_CACHE_TTL = int(os.environ.get("EMAIL_CACHE_TTL", 30 * 24 * 3600))
+
+# Per-page progress of domain scrapes: failed scrapes resume where they stopped,
+# and incremental refreshes stop at contacts already known (see checkpoints.py).
+checkpoints = CheckpointStore()
 
 # Define the request data models
 class ScrapeRequest(BaseModel):
     company_domain: str
+    force_refresh: bool = False
+    person_titles: Optional[List[str]] = None
+    incremental: bool = False
 
 class EmailRequest(BaseModel):
     profile_url: str
+    force_refresh: bool = False
+
+class BulkEmailRequest(BaseModel):
+    profile_urls: Optional[List[str]] = None
+    company_domain: Optional[str] = None
+    force_refresh: bool = False
+    person_titles: Optional[List[str]] = None
+
+class PeopleRequest(BaseModel):
+    name: str
+    limit: int = PEOPLE_LIMIT
+
+class ScrapeJobRequest(BaseModel):
+    company_domains: List[str]
+    force_refresh: bool = False
+    person_titles: Optional[List[str]] = None
+    incremental: bool = False
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """
+    Gives every request an id (the X-Request-ID header, or a new one) that is
+    attached to its logs and returned in the response, and records its duration.
+    """
+    token = request_id.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12])
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id.get()
+        # The route template keeps the label cardinality bounded (/jobs/{job_id})
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - start)
+        return response
+    finally:
+        request_id.reset(token)
+
+async def cached_scrape(company_domain: str, force_refresh: bool = False, person_titles=None, incremental: bool = False):
+    """
+    Returns the contacts of a domain from the cache, or scrapes them and caches
+    the result. Returns None if scraping failed.
+
+    An incremental scrape skips the cache and only reads the results pages
+    up to the first contact found by the last complete scrape.
+    """
+    key = scrape_cache_key(company_domain, person_titles)
+    if not force_refresh and not incremental:
+        contacts = cache.get("scrape", key, ttl=SCRAPE_CACHE_TTL)
+        if contacts is not None:
+            logger.info("Cache hit for domain: %s", key)
+            return contacts
+
+    contacts = await pool.run(
+        "scrape_apollo", company_domain, person_titles=person_titles,
+        # A forced refresh starts over instead of resuming a failed scrape
+        checkpoint=checkpoints.checkpoint(key), incremental=incremental, resume=not force_refresh,
+    )
+    if contacts is not None:
+        cache.set("scrape", key, contacts)
+    return contacts
+
+async def cached_get_email(profile_url: str, force_refresh: bool = False):
+    """
+    Returns the email of a profile from the cache, or reveals it and caches
+    the result.
+    """
+    key = profile_id_from_url(profile_url)
+    if not force_refresh:
+        email_result = cache.get("get_email", key, ttl=EMAIL_CACHE_TTL)
+        if email_result is not None:
+            logger.info("Cache hit for profile: %s", key)
+            return email_result
+
+    email_result = await pool.run("get_email", profile_url)
+    cache.set("get_email", key, email_result)
+    return email_result
 
 @app.post("/scrape")
 async def scrape_domain(request: ScrapeRequest):
@@ -24,39 +139,257 @@ async def scrape_domain(request: ScrapeRequest):
     This endpoint receives a company domain, scrapes Apollo.io,
     and returns the resulting contacts.
     """
-    print(f"Received request to scrape for domain: {request.company_domain}")
+    logger.info("Received request to scrape for domain: %s", request.company_domain)
     
     try:
-        result_contacts = scraper.scrape_apollo(request.company_domain)
+        result_contacts = await cached_scrape(request.company_domain, request.force_refresh, request.person_titles, request.incremental)
         
         if result_contacts is not None:
-            print(f"Successfully scraped. Found {len(result_contacts)} contacts.")
+            logger.info("Successfully scraped. Found %s contacts.", len(result_contacts))
             return {"status": "success", "contacts": result_contacts}
         else:
-            print("Scraping failed, scraper returned None.")
+            logger.error("Scraping failed, scraper returned None.")
             raise HTTPException(status_code=500, detail="Scraping failed. Check the API logs for more details.")
             
     except Exception as e:
-        print(f"An exception occurred during scraping: {e}")
+        logger.error("An exception occurred during scraping: %s", e)
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
+@app.post("/scrape/stream")
+async def scrape_domain_stream(request: ScrapeRequest, format: str = "ndjson", limit: Optional[int] = None):
+    """
+    Same as /scrape, but streams each contact as soon as its results page has
+    been extracted, as NDJSON (one contact per line) or as Server-Sent Events
+    (`?format=sse`). `limit` overrides the default contact limit.
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'.")
+    logger.info("Received request to stream contacts for domain: %s", request.company_domain)
+
+    def encode(event, data):
+        if format == "sse":
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps(data) + "\n"
+
+    async def contacts_stream():
+        # Only full scrapes with the default limit are cached, like /scrape
+        cacheable = limit is None
+        key = scrape_cache_key(request.company_domain, request.person_titles)
+        contacts = cache.get("scrape", key, ttl=SCRAPE_CACHE_TTL) if cacheable and not request.force_refresh else None
+        if contacts is not None:
+            logger.info("Cache hit for domain: %s", key)
+            for contact in contacts:
+                yield encode("contact", contact)
+            yield encode("end", {"status": "success", "count": len(contacts)})
+            return
+
+        collected = [] if cacheable else None
+        count = 0
+        try:
+            async for page_contacts in pool.stream("iter_scrape_apollo", request.company_domain, limit or CONTACT_LIMIT, request.person_titles):
+                for contact in page_contacts:
+                    yield encode("contact", contact)
+                count += len(page_contacts)
+                if collected is not None:
+                    collected.extend(page_contacts)
+        except Exception as e:
+            logger.error("An exception occurred during streamed scraping: %s", e)
+            yield encode("error", {"status": "error", "error": str(e)})
+            return
+
+        if collected is not None:
+            cache.set("scrape", key, collected)
+        yield encode("end", {"status": "success", "count": count})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(contacts_stream(), media_type=media_type)
+
 @app.post("/get_email")
 async def get_email_from_profile(request: EmailRequest):
     """
     This endpoint receives a profile URL, scrapes the email,
     and returns it.
     """
-    print(f"Received request to get email for profile URL: {request.profile_url}")
+    logger.info("Received request to get email for profile URL: %s", request.profile_url)
     
     try:
-        email_result = scraper.get_email(request.profile_url)
+        email_result = await cached_get_email(request.profile_url, request.force_refresh)
         return email_result
     except Exception as e:
-        print(f"An exception occurred during email scraping: {e}")
+        logger.error("An exception occurred during email scraping: %s", e)
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
 
-# This part ensures the driver is closed properly on shutdown
+@app.post("/get_emails")
+async def get_emails_from_profiles(request: BulkEmailRequest):
+    """
+    This endpoint reveals the emails of many profiles in one call: either the
+    given `profile_urls`, or the contacts with an email of `company_domain`
+    (scraped, or read from the cache). Profiles are de-duplicated by Apollo
+    person id, cached emails are returned without using a driver and the
+    others are spread across the pool. Failures are reported per profile.
+    """
+    if bool(request.profile_urls) == bool(request.company_domain):
+        raise HTTPException(status_code=400, detail="Provide either profile_urls or company_domain.")
+
+    profile_urls = request.profile_urls
+    if request.company_domain:
+        logger.info("Received request to get emails for domain: %s", request.company_domain)
+        contacts = await cached_scrape(request.company_domain, request.force_refresh, request.person_titles)
+        if contacts is None:
+            raise HTTPException(status_code=500, detail="Scraping failed. Check the API logs for more details.")
+        profile_urls = [contact["name_link"] for contact in contacts if contact.get("email_verified") and contact.get("name_link")]
+    else:
+        logger.info("Received request to get emails for %s profile URLs", len(profile_urls))
+
+    # First URL seen for each person id, in request order
+    profiles = {}
+    for profile_url in profile_urls:
+        profiles.setdefault(profile_id_from_url(profile_url), profile_url)
+
+    results = {}
+    for person_id, profile_url in profiles.items():
+        email_result = None if request.force_refresh else cache.get("get_email", person_id, ttl=EMAIL_CACHE_TTL)
+        if email_result is not None:
+            results[person_id] = {"profile_url": profile_url, "person_id": person_id, **email_result, "cached": True}
+
+    # At most one reveal per driver at a time, so other requests still get a turn
+    slots = asyncio.Semaphore(pool.size)
+
+    async def reveal(person_id, profile_url):
+        async with slots:
+            try:
+                email_result = await cached_get_email(profile_url, force_refresh=True)
+                return {"profile_url": profile_url, "person_id": person_id, **email_result, "cached": False}
+            except Exception as e:
+                logger.error("An exception occurred while revealing %s: %s", profile_url, e)
+                return {"profile_url": profile_url, "person_id": person_id, "status": "error", "error": str(e)}
+
+    pending = [(person_id, profile_url) for person_id, profile_url in profiles.items() if person_id not in results]
+    for result in await asyncio.gather(*[reveal(person_id, profile_url) for person_id, profile_url in pending]):
+        results[result["person_id"]] = result
+
+    ordered = [results[person_id] for person_id in profiles]
+    failures = [result for result in ordered if result["status"] == "error"]
+    if not failures:
+        status = "success"
+    else:
+        status = "partial" if len(failures) < len(ordered) else "error"
+    return {
+        "status": status,
+        "results": [result for result in ordered if result["status"] != "error"],
+        "failures": failures,
+        "counts": {
+            "requested": len(profile_urls),
+            "unique": len(profiles),
+            "cached": len(profiles) - len(pending),
+            "revealed": len(pending) - len(failures),
+            "failed": len(failures),
+        },
+    }
+
+@app.post("/people")
+async def get_people_by_name(request: PeopleRequest):
+    """
+    This endpoint searches Apollo people by name and returns up to `limit`
+    de-duplicated results.
+    """
+    logger.info("Received request to search people by name: %s", request.name)
+    if not request.name.strip() or request.limit < 1:
+        raise HTTPException(status_code=400, detail="name must not be empty and limit must be positive.")
+
+    try:
+        people = await pool.run("get_people_by_name", request.name, request.limit)
+        return {"status": "success", "people": people}
+    except Exception as e:
+        logger.error("An exception occurred during people search: %s", e)
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
+
+# Background scheduler for batch scrape jobs, one worker per scraper in the pool.
+scheduler = JobScheduler(cached_scrape, concurrency=pool.size)
+
+# Start every driver when the API boots instead of on the first request.
+WARM_UP_DRIVERS = os.environ.get("WARM_UP_DRIVERS", "1") != "0"
+warm_up_task = None
+
+@app.on_event("startup")
+async def startup_event():
+    global warm_up_task
+    scheduler.start()
+    if WARM_UP_DRIVERS:
+        warm_up_task = asyncio.create_task(pool.warm_up())
+
+@app.get("/ready")
+async def readiness():
+    """
+    Returns 200 once the drivers have been warmed up (at least one of them
+    successfully), 503 while they are still starting.
+    """
+    ready = not WARM_UP_DRIVERS or (pool.warm_up_done and pool.warmed_up > 0)
+    body = {"ready": ready, "warmed_up": pool.warmed_up, "pool_size": pool.size}
+    if not ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@app.post("/jobs/scrape")
+async def submit_scrape_job(request: ScrapeJobRequest):
+    """
+    This endpoint queues a list of company domains for scraping and returns
+    a job id immediately. Poll GET /jobs/{job_id} for the results.
+    """
+    if not request.company_domains:
+        raise HTTPException(status_code=400, detail="company_domains must not be empty.")
+    job = scheduler.submit(request.company_domains, request.force_refresh, request.person_titles, request.incremental)
+    return job.to_dict(include_results=False)
+
+@app.get("/jobs/{job_id}")
+async def get_scrape_job(job_id: str, include_results: bool = True):
+    """
+    Returns the status of a job and the status, contacts or error of each domain.
+    """
+    job = scheduler.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job.to_dict(include_results=include_results)
+
+@app.delete("/jobs/{job_id}")
+async def cancel_scrape_job(job_id: str):
+    """
+    Cancels the domains of a job that have not started yet. Domains already
+    being scraped finish normally.
+    """
+    job = scheduler.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job.to_dict(include_results=False)
+
+@app.get("/pool")
+async def pool_status():
+    """
+    Returns the pool size, busy/idle workers and the number of queued requests.
+    """
+    return {**pool.stats(), "jobs": scheduler.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: stage latencies, pages per scrape, contacts per page,
+    failures by page state, screenshots, request durations and pool gauges.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/cache")
+async def cache_status():
+    """
+    Returns the number of cached entries and the hit/miss counters per endpoint,
+    and the number of finished and unfinished scrape checkpoints.
+    """
+    return {**cache.stats(), "checkpoints": checkpoints.stats()}
+
+# This part ensures the drivers are closed properly on shutdown
 @app.on_event("shutdown")
-def shutdown_event():
-    scraper.quit_driver()
-    print("Application shutdown. WebDriver closed.")
+async def shutdown_event():
+    await scheduler.stop()
+    pool.shutdown()
+    cache.close()
+    checkpoints.close()
+    logger.info("Application shutdown. WebDrivers closed.")
@@ -0,0 +1,377 @@
+# bench/mock_apollo.py
+
+"""
+Local stand-in for app.apollo.io, used by the benchmarks.
+
+It serves a small single-page app that reproduces the parts of Apollo the
+scraper relies on: the `#table-row-{i}` results table, `page=N` pagination,
+the empty state, the blocking overlay, the profile email reveal and the login
+page, backed by JSON endpoints shaped like Apollo's API. Elements are placed
+at the exact XPaths/selectors used by apollo_scraper.py.
+
+The company domain picks the scenario:
+- `empty.<anything>`: no results
+- `blocked.<anything>`: blocking overlay, results after clicking its button
+- `n<count>.<anything>`: <count> people (e.g. `n120.example.com`)
+- anything else: DEFAULT_PEOPLE people
+
+API calls without the `mock_session` cookie get a 401 and the app shows the
+login page, so cookie injection is exercised too.
+
+Run standalone with:
+    python -m bench.mock_apollo --port 8900 --latency-ms 50
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+
+from apollo_scraper import (
+    BLOCKING_ELEMENT_XPATH,
+    BUTTON_IF_BLOCKED_SELECTOR,
+    EMAIL_BUTTON_XPATH,
+    LOCKED_EMAIL_SUFFIX,
+    ORGANIZATION_DOMAINS_PARAM,
+    PAGE_SIZE,
+    REVEALED_EMAIL_XPATH,
+)
+
+DEFAULT_PEOPLE = 60
+KEYWORD_SEARCH_PEOPLE = 40
+SESSION_COOKIE = "mock_session"
+
+TITLES = ["CTO", "IT Manager", "Project Manager", "Developer", "CEO", "Talent Acquisition"]
+EMAIL_STATUSES = ["verified", "verified", "unverified", "unavailable"]
+
+APP_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Mock Apollo</title>
+<script>
+const CONFIG = __CONFIG__;
+let renderToken = 0;
+const unblockedDomains = new Set();
+
+// Creates the missing elements along an absolute /html/body/... XPath and returns the last one.
+function buildXPath(xpath) {
+    let node = document.documentElement;
+    for (const step of xpath.split('/').filter(Boolean).slice(1)) {
+        const match = step.match(/^(\\w+)(?:\\[(\\d+)\\])?$/);
+        const tag = match[1];
+        const index = match[2] ? parseInt(match[2], 10) : 1;
+        const children = Array.from(node.children).filter(function(child) { return child.tagName.toLowerCase() === tag; });
+        while (children.length < index) {
+            const element = document.createElement(tag);
+            node.appendChild(element);
+            children.push(element);
+        }
+        node = children[index - 1];
+    }
+    return node;
+}
+
+// Creates the missing elements along a "a > b > c" CSS path below `root` and returns the last one.
+function buildCss(selector, root) {
+    let node = root || document.body;
+    for (const part of selector.split(' > ')) {
+        let element = node.querySelector(':scope > ' + part);
+        if (!element) {
+            const match = part.match(/^(\\w+)?(#[\\w-]+)?((?:\\.[\\w-]+)*)(?::nth-child\\((\\d+)\\))?$/);
+            const position = match[4] ? parseInt(match[4], 10) : null;
+            if (position) {
+                while (node.children.length < position - 1) node.appendChild(document.createElement('div'));
+            }
+            element = document.createElement(match[1] || 'div');
+            if (match[2]) element.id = match[2].slice(1);
+            if (match[3]) element.className = match[3].split('.').filter(Boolean).join(' ');
+            if (position && node.children.length >= position) node.insertBefore(element, node.children[position - 1]);
+            else node.appendChild(element);
+        }
+        node = element;
+    }
+    return node;
+}
+
+async function api(path, body) {
+    const options = body === undefined ? {} : {method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body)};
+    const response = await fetch(path, options);
+    if (response.status === 401) {
+        location.hash = '#/login';
+        return null;
+    }
+    return response.json();
+}
+
+function renderLogin() {
+    const form = document.createElement('form');
+    form.innerHTML = '<input type="email" name="email"><input type="password" name="password"><button>Log In</button>';
+    document.body.appendChild(form);
+}
+
+function renderBlocked(domain) {
+    buildXPath(CONFIG.blockingXpath).textContent = 'Too many filters';
+    const button = buildCss(CONFIG.blockedButtonSelector);
+    button.textContent = 'Show results';
+    button.addEventListener('click', function() {
+        unblockedDomains.add(domain);
+        render();
+    });
+}
+
+function renderRow(table, person, index) {
+    const row = document.createElement('div');
+    row.id = 'table-row-' + index;
+    table.appendChild(row);
+    const name = buildCss('div.zp_biVWr.zp_wDB4y > div:nth-child(2) > div > div > a', row);
+    name.textContent = person.name;
+    name.href = '#/people/' + person.id;
+    buildCss('div:nth-child(2) > div > div > div.zp_YGDgt > span > span', row).textContent = person.title;
+    buildCss('div:nth-child(3) > div > div > div > span > div > div > div > div.zp_PaniY > a > span', row).textContent = person.organization.name;
+    const email = buildCss('div:nth-child(4) > div > span > button', row);
+    email.setAttribute('data-tour-id', 'email-cell-' + person.email_status);
+    email.textContent = 'Email';
+}
+
+async function renderSearch(token, params) {
+    const domains = params.getAll(CONFIG.domainsParam);
+    if (domains.length && domains[0].indexOf('blocked.') === 0 && !unblockedDomains.has(domains[0])) {
+        renderBlocked(domains[0]);
+        return;
+    }
+    const data = await api('/api/v1/mixed_people/search', {
+        page: parseInt(params.get('page') || '1', 10),
+        per_page: CONFIG.pageSize,
+        q_organization_domains: domains,
+        person_titles: params.getAll('personTitles[]'),
+        q_keywords: params.get('qKeywords') || '',
+    });
+    if (data === null || token !== renderToken) return;
+    if (!data.people.length) {
+        const empty = document.createElement('div');
+        empty.className = 'people-finder-shell-container people-finder-shell-empty-state-shown';
+        empty.textContent = 'No people match your criteria';
+        document.body.appendChild(empty);
+        return;
+    }
+    const table = document.createElement('div');
+    table.id = 'people-table';
+    document.body.appendChild(table);
+    data.people.forEach(function(person, index) { renderRow(table, person, index); });
+}
+
+function showEmail(email) {
+    const anchor = buildXPath(CONFIG.revealedEmailXpath);
+    anchor.textContent = email;
+    anchor.href = 'mailto:' + email;
+}
+
+async function renderProfile(token, personId) {
+    const data = await api('/api/v1/people/' + personId);
+    if (data === null || token !== renderToken) return;
+    const email = data.person.email;
+    if (email && !email.endsWith(CONFIG.lockedEmailSuffix)) {
+        showEmail(email);
+        return;
+    }
+    const button = buildXPath(CONFIG.emailButtonXpath);
+    button.textContent = 'Access email';
+    button.addEventListener('click', async function() {
+        const revealed = await api('/api/v1/mixed_people/add_to_my_prospects', {entity_ids: [personId]});
+        if (revealed !== null) showEmail(revealed.contacts[0].email);
+    });
+}
+
+function render() {
+    const token = ++renderToken;
+    document.body.innerHTML = '';
+    const hash = location.hash;
+    if (hash.indexOf('#/login') === 0) return renderLogin();
+    const profile = hash.match(/^#\\/people\\/(\\w+)/);
+    if (profile) return renderProfile(token, profile[1]);
+    if (hash.indexOf('#/people') === 0) return renderSearch(token, new URLSearchParams(hash.split('?')[1] || ''));
+    document.body.textContent = 'Mock Apollo';
+}
+
+window.addEventListener('hashchange', render);
+window.addEventListener('DOMContentLoaded', render);
+</script>
+</head>
+<body></body>
+</html>
+"""
+
+
+def person_id(domain, index):
+    """Deterministic, URL-safe person id that encodes its domain and index."""
+    return f"{domain}|{index}".encode().hex()
+
+
+def parse_person_id(value):
+    domain, index = bytes.fromhex(value).decode().rsplit("|", 1)
+    return domain, int(index)
+
+
+def people_count(domain):
+    if domain.startswith("empty."):
+        return 0
+    match = re.match(r"n(\d+)\.", domain)
+    return int(match.group(1)) if match else DEFAULT_PEOPLE
+
+
+def make_person(domain, index, revealed=False):
+    """Builds a person record shaped like Apollo's search API."""
+    digest = hashlib.sha1(domain.encode()).hexdigest()
+    email = f"person{index}@{domain}" if revealed or index % 5 == 0 else LOCKED_EMAIL_SUFFIX
+    return {
+        "id": person_id(domain, index),
+        "first_name": f"Person{index}",
+        "last_name": domain.split(".")[0].capitalize(),
+        "name": f"Person{index} {domain.split('.')[0].capitalize()}",
+        "title": TITLES[index % len(TITLES)],
+        "email_status": EMAIL_STATUSES[index % len(EMAIL_STATUSES)],
+        "email": email,
+        "linkedin_url": f"http://www.linkedin.com/in/person{index}-{digest[:8]}",
+        "seniority": "manager",
+        "departments": ["engineering_technical"],
+        "city": "Paris",
+        "state": "Ile-de-France",
+        "country": "France",
+        "organization_id": digest[:24],
+        "organization": {
+            "id": digest[:24],
+            "name": domain.split(".")[0].capitalize() + " Inc",
+            "primary_domain": domain,
+            "linkedin_url": f"http://www.linkedin.com/company/{digest[:8]}",
+        },
+    }
+
+
+def search_response(body):
+    page = max(1, int(body.get("page") or 1))
+    per_page = int(body.get("per_page") or PAGE_SIZE)
+    domains = body.get("q_organization_domains") or []
+    if domains:
+        domain = domains[0].lower()
+        total = people_count(domain)
+    else:
+        keywords = (body.get("q_keywords") or "people").strip().lower().replace(" ", "-")
+        domain = f"{keywords}.search"
+        total = KEYWORD_SEARCH_PEOPLE
+
+    start = (page - 1) * per_page
+    people = [make_person(domain, index) for index in range(start, min(start + per_page, total))]
+    return {
+        "people": people,
+        "contacts": [],
+        "pagination": {
+            "page": page,
+            "per_page": per_page,
+            "total_entries": total,
+            "total_pages": (total + per_page - 1) // per_page,
+        },
+    }
+
+
+class MockApolloHandler(BaseHTTPRequestHandler):
+    """Serves the mock app and its API. `latency` (seconds) is added to every API call."""
+
+    latency = 0.0
+    page_latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authenticated(self):
+        return f"{SESSION_COOKIE}=" in (self.headers.get("Cookie") or "")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path in ("/", "/index.html"):
+            time.sleep(self.page_latency)
+            body = APP_HTML.replace("__CONFIG__", json.dumps({
+                "blockingXpath": BLOCKING_ELEMENT_XPATH,
+                "blockedButtonSelector": BUTTON_IF_BLOCKED_SELECTOR,
+                "emailButtonXpath": EMAIL_BUTTON_XPATH,
+                "revealedEmailXpath": REVEALED_EMAIL_XPATH,
+                "domainsParam": ORGANIZATION_DOMAINS_PARAM,
+                "lockedEmailSuffix": LOCKED_EMAIL_SUFFIX,
+                "pageSize": PAGE_SIZE,
+            })).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        match = re.fullmatch(r"/api/v1/people/(\w+)", path)
+        if match:
+            time.sleep(self.latency)
+            if not self._authenticated():
+                return self._send_json({"error": "login required"}, status=401)
+            domain, index = parse_person_id(match.group(1))
+            return self._send_json({"person": make_person(domain, index)})
+
+        self.send_error(404)
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        if not path.startswith("/api/v1/"):
+            return self.send_error(404)
+        time.sleep(self.latency)
+        if not self._authenticated():
+            return self._send_json({"error": "login required"}, status=401)
+        body = self._read_json()
+
+        if path == "/api/v1/mixed_people/search":
+            return self._send_json(search_response(body))
+        if path == "/api/v1/mixed_people/add_to_my_prospects":
+            contacts = []
+            for entity_id in body.get("entity_ids") or []:
+                domain, index = parse_person_id(entity_id)
+                person = make_person(domain, index, revealed=True)
+                contacts.append({**person, "id": f"contact-{entity_id}", "person_id": entity_id})
+            return self._send_json({"contacts": contacts})
+        self.send_error(404)
+
+
+def start_mock_server(port=0, latency=0.0, page_latency=0.0):
+    """Starts the mock in a background thread. Returns (server, base_url)."""
+    handler = type("ConfiguredMockApolloHandler", (MockApolloHandler,), {"latency": latency, "page_latency": page_latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for app.apollo.io")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every API call")
+    parser.add_argument("--page-latency-ms", type=float, default=0, help="delay added to every page load")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.latency_ms / 1000, args.page_latency_ms / 1000)
+    print(f"Mock Apollo running on {base_url} (APOLLO_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,293 @@
+# bench/run_benchmarks.py
+
+"""
+Offline benchmarks of the scraper against the local mock of Apollo.
+
+Measures driver startup, session initialization (cookie injection), page
+navigation and row extraction (both engines), and end-to-end /scrape and
+/get_email latency through the real FastAPI app at several concurrency
+levels. Results are printed and written as JSON so runs can be compared
+across commits.
+
+Usage (from the repository root):
+    python -m bench.run_benchmarks
+    python -m bench.run_benchmarks --latency-ms 80 --concurrency 1 2 4
+    python -m bench.run_benchmarks --compare bench/results/<old>.json
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentiles(samples):
+    """Summary of a list of durations in seconds, reported in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def at(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.mean(ordered) * 1000, 2),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "min": round(ordered[0] * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_cookies_file(directory):
+    path = os.path.join(directory, "cookies.json")
+    with open(path, "w") as f:
+        json.dump([{"name": "mock_session", "value": "benchmark", "path": "/"}], f)
+    return path
+
+
+def bench_driver(cookies_file, runs):
+    """Cold driver startup and session initialization, each on a fresh driver."""
+    from apollo_scraper import ApolloScraper
+
+    startup, session = [], []
+    for _ in range(runs):
+        scraper = ApolloScraper(cookies_file)
+        try:
+            start = time.perf_counter()
+            scraper.setup_driver()
+            startup.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            scraper.open_session()
+            session.append(time.perf_counter() - start)
+        finally:
+            scraper.quit_driver()
+    return {"driver_startup": percentiles(startup), "session_init": percentiles(session)}
+
+
+def bench_pages(cookies_file, engine, domains, pages):
+    """Navigation and extraction time per results page, on one warm driver."""
+    from apollo_scraper import ApolloScraper, build_people_search_url
+
+    navigation, extraction = [], []
+    scraper = ApolloScraper(cookies_file, extraction_engine=engine)
+    try:
+        scraper.warm_up()
+        for domain in domains:
+            for page in range(1, pages + 1):
+                url = build_people_search_url(page=page, organization_domains=[domain])
+                start = time.perf_counter()
+                scraper.open_results_page(url)
+                navigation.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                rows = scraper.extract_page_rows()
+                extraction.append(time.perf_counter() - start)
+                if not rows:
+                    raise RuntimeError(f"No rows extracted from {url}")
+    finally:
+        scraper.quit_driver()
+    return {"navigation": percentiles(navigation), "extraction": percentiles(extraction)}
+
+
+def start_api(port):
+    """Runs the FastAPI app in a background thread and waits until its drivers are warm."""
+    import uvicorn
+    from app import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 300
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready") as response:
+                if response.status == 200:
+                    return server, base_url
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("The API did not become ready in time.")
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.loads(response.read())
+
+
+def bench_endpoint(url, payloads, concurrency):
+    """Sends every payload with `concurrency` clients. Returns latency percentiles and throughput."""
+    latencies, errors = [], 0
+
+    def send(payload):
+        start = time.perf_counter()
+        post_json(url, payload)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(send, payload) for payload in payloads]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception as e:
+                print(f"Request failed: {e}")
+                errors += 1
+    elapsed = time.perf_counter() - start
+    return {
+        **percentiles(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0,
+    }
+
+
+def bench_api(args, port):
+    from bench.mock_apollo import person_id
+
+    server, api_url = start_api(port)
+    results = {"scrape": {}, "get_email": {}}
+    try:
+        for concurrency in args.concurrency:
+            count = max(args.requests, concurrency)
+            payloads = [
+                {"company_domain": f"n{args.people}.api-{concurrency}-{i}.example", "force_refresh": True}
+                for i in range(count)
+            ]
+            results["scrape"][str(concurrency)] = bench_endpoint(f"{api_url}/scrape", payloads, concurrency)
+
+            payloads = [
+                {"profile_url": f"{os.environ['APOLLO_BASE_URL']}/#/people/{person_id(f'email-{concurrency}.example', i * 5 + 1)}", "force_refresh": True}
+                for i in range(count)
+            ]
+            results["get_email"][str(concurrency)] = bench_endpoint(f"{api_url}/get_email", payloads, concurrency)
+    finally:
+        server.should_exit = True
+    return results
+
+
+def flatten(results, prefix=""):
+    """Maps 'section.metric' to its p50 for every percentile summary in `results`."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict) and "p50" in value:
+            flat[name] = value["p50"]
+        elif isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+    return flat
+
+
+def compare(previous_path, report):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    before, after = flatten(previous["results"]), flatten(report["results"])
+    print(f"\nComparaison avec {previous.get('commit')} (p50, ms):")
+    for name in sorted(set(before) & set(after)):
+        change = (after[name] - before[name]) / before[name] * 100 if before[name] else 0
+        print(f"  {name:45} {before[name]:>10} -> {after[name]:>10}  ({change:+.1f}%)")
+
+
+def print_report(report):
+    print(f"\nRésultats ({report['commit']}):")
+    for name, p50 in flatten(report["results"]).items():
+        print(f"  {name:45} p50 {p50:>10} ms")
+    for endpoint, levels in report["results"].get("api", {}).items():
+        for concurrency, result in levels.items():
+            print(f"  {endpoint} @ {concurrency} clients: {result['throughput_rps']} req/s, p99 {result.get('p99')} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against the local Apollo mock")
+    parser.add_argument("--latency-ms", type=float, default=50, help="delay the mock adds to every API call")
+    parser.add_argument("--page-latency-ms", type=float, default=20, help="delay the mock adds to every page load")
+    parser.add_argument("--driver-runs", type=int, default=3, help="fresh drivers started for the startup benchmark")
+    parser.add_argument("--pages", type=int, default=4, help="results pages read per domain")
+    parser.add_argument("--domains", type=int, default=3, help="domains read per extraction engine")
+    parser.add_argument("--people", type=int, default=100, help="people per domain in the API benchmark")
+    parser.add_argument("--requests", type=int, default=8, help="requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--skip-api", action="store_true", help="only run the driver and page benchmarks")
+    parser.add_argument("--output", help="JSON results path (default: bench/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    workdir = tempfile.mkdtemp(prefix="apollo-bench-")
+    cookies_file = write_cookies_file(workdir)
+
+    # Settings are read at import time, so they must be set before importing the scraper, the mock or the app
+    os.environ["APOLLO_BASE_URL"] = mock_url
+    os.environ["APOLLO_COOKIES_FILE"] = cookies_file
+    os.environ["CACHE_PATH"] = os.path.join(workdir, "cache.sqlite3")
+    os.environ["FIREFOX_PROFILE_DIR"] = os.path.join(workdir, "profiles")
+    os.environ["SCRAPER_POOL_SIZE"] = str(max(args.concurrency))
+    # Measure the scraper, not the per-account rate limiter
+    os.environ["ACCOUNT_RATE_PER_MINUTE"] = "0"
+
+    from bench.mock_apollo import start_mock_server
+
+    mock, _ = start_mock_server(mock_port, latency=args.latency_ms / 1000, page_latency=args.page_latency_ms / 1000)
+
+    print(f"Mock Apollo sur {mock_url} (latence API {args.latency_ms} ms)")
+    results = {}
+    results["driver"] = bench_driver(cookies_file, args.driver_runs)
+    domains = [f"n{args.pages * 25}.pages-{i}.example" for i in range(args.domains)]
+    results["pages"] = {engine: bench_pages(cookies_file, engine, domains, args.pages) for engine in ("dom", "network")}
+    if not args.skip_api:
+        results["api"] = bench_api(args, args.api_port)
+    mock.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    if args.compare:
+        compare(args.compare, report)
+    print(f"\nRésultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# checkpoints.py
+
+from result_cache import DEFAULT_CACHE_PATH
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Checkpoints live in the cache database unless CHECKPOINT_PATH is set.
+DEFAULT_CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", DEFAULT_CACHE_PATH)
+# Unfinished checkpoints older than this (seconds) are ignored: the scrape restarts from page 1.
+CHECKPOINT_TTL = int(os.environ.get("CHECKPOINT_TTL", 24 * 3600))
+
+
+class CheckpointStore:
+    """
+    Progress of domain scrapes, saved in SQLite after every results page.
+
+    An unfinished checkpoint lets a failed scrape resume after its last saved
+    page. A finished one holds the contacts of the last complete scrape, which
+    incremental refreshes use to stop at contacts already known.
+    """
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH, ttl=CHECKPOINT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scrape_checkpoints (
+                key TEXT PRIMARY KEY,
+                contacts TEXT NOT NULL,
+                last_page INTEGER NOT NULL,
+                finished INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def checkpoint(self, key):
+        """Returns the handle passed to ApolloScraper.scrape_apollo for the scrape `key`."""
+        return Checkpoint(self, key)
+
+    def load(self, key):
+        """
+        Returns {"contacts", "last_page", "finished", "updated_at"} for `key`,
+        or None if there is no checkpoint or it is an expired unfinished one.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT contacts, last_page, finished, updated_at FROM scrape_checkpoints WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        contacts, last_page, finished, updated_at = row
+        if not finished and time.time() - updated_at > self.ttl:
+            return None
+        return {"contacts": json.loads(contacts), "last_page": last_page, "finished": bool(finished), "updated_at": updated_at}
+
+    def save_page(self, key, page, page_contacts):
+        """Records a completed page. Page 1 starts a new scrape; later pages add to the saved contacts."""
+        with self._lock:
+            contacts = []
+            if page > 1:
+                row = self._connection.execute("SELECT contacts FROM scrape_checkpoints WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    contacts = json.loads(row[0])
+            contacts.extend(page_contacts)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO scrape_checkpoints (key, contacts, last_page, finished, updated_at) VALUES (?, ?, ?, 0, ?)",
+                (key, json.dumps(contacts), page, time.time()),
+            )
+
+    def finish(self, key, contacts):
+        """Marks the scrape as complete, with its final list of contacts."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO scrape_checkpoints (key, contacts, last_page, finished, updated_at) "
+                "VALUES (?, ?, COALESCE((SELECT last_page FROM scrape_checkpoints WHERE key = ?), 0), 1, ?)",
+                (key, json.dumps(contacts), key, time.time()),
+            )
+
+    def stats(self):
+        with self._lock:
+            finished, unfinished = self._connection.execute(
+                "SELECT COALESCE(SUM(finished), 0), COALESCE(SUM(1 - finished), 0) FROM scrape_checkpoints"
+            ).fetchone()
+        return {"finished": finished, "unfinished": unfinished}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class Checkpoint:
+    """The checkpoint of one scrape (one CheckpointStore key)."""
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+
+    def load(self):
+        return self.store.load(self.key)
+
+    def save_page(self, page, page_contacts):
+        self.store.save_page(self.key, page, page_contacts)
+
+    def finish(self, contacts):
+        self.store.finish(self.key, contacts)
@@ -0,0 +1,225 @@
+# cli.py
+
+"""
+Non-interactive bulk runs: reads company domains, profile URLs or names (one
+per line) from a file or stdin, processes them with several worker processes
+each owning a Firefox driver, and appends one JSON line per input to the
+output file as soon as it is done.
+
+Usage:
+    python cli.py scrape domains.txt -o contacts.jsonl --workers 4
+    python cli.py email profile_urls.txt -o emails.jsonl
+    cat names.txt | python cli.py people - -o people.jsonl
+
+Re-running with the same output file skips the inputs already done, so an
+interrupted run resumes where it stopped (failed inputs are tried again).
+"""
+
+from apollo_scraper import CONTACT_LIMIT, FIREFOX_PROFILE_DIR, PEOPLE_LIMIT
+from result_cache import scrape_cache_key
+from telemetry import configure_logging, request_id
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = int(os.environ.get("CLI_WORKERS", 2))
+
+# Command name -> ApolloScraper method
+OPERATIONS = {
+    "scrape": "scrape_apollo",
+    "email": "get_email",
+    "people": "get_people_by_name",
+}
+
+
+def read_inputs(path):
+    """Returns the non-empty lines of `path` ("-" for stdin), without duplicates or # comments."""
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        lines = [line.strip() for line in f]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+
+
+def read_done(output_path):
+    """Returns the inputs recorded as successful in an existing output file."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of a run killed while writing
+                continue
+            if record.get("status") == "success":
+                done.add(record["input"])
+    return done
+
+
+def run_one(pool, command, value, args, checkpoints=None):
+    """Runs one input through the worker's pool and returns its output record."""
+    start = time.perf_counter()
+    record = {"input": value, "operation": command}
+    try:
+        if command == "scrape":
+            # Same key as the API: normalized domain plus titles, so other titles never resume this scrape
+            checkpoint = checkpoints.checkpoint(scrape_cache_key(value, args.person_titles)) if checkpoints else None
+            result = pool.call(
+                "scrape_apollo", value, args.limit or CONTACT_LIMIT, args.person_titles,
+                checkpoint=checkpoint, resume=not args.no_resume,
+            )
+            if result is None:
+                raise Exception("Scraping failed. Check the logs for more details.")
+        elif command == "people":
+            result = pool.call("get_people_by_name", value, args.limit or PEOPLE_LIMIT)
+        else:
+            result = pool.call("get_email", value)
+        record.update(status="success", result=result)
+    except Exception as e:
+        record.update(status="error", error=str(e))
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def worker_main(index, account, share, command, args, tasks, results):
+    """
+    Worker process: owns a single-driver ScraperPool on one account (driver
+    supervision, recycling and retries as in the API) and processes inputs
+    until it receives None.
+    """
+    from checkpoints import CheckpointStore
+    from scraper_pool import ScraperPool
+
+    configure_logging()
+    profile_dir = os.path.join(FIREFOX_PROFILE_DIR, f"cli-{index}") if FIREFOX_PROFILE_DIR else None
+    pool = ScraperPool(account, size=1, profile_dir=profile_dir)
+    # The account's rate limit and email credits are split between the processes sharing it
+    for shared_account in pool.accounts:
+        if shared_account.bucket:
+            shared_account.bucket.rate /= share
+        if shared_account.email_credits:
+            shared_account.email_credits = max(1, shared_account.email_credits // share)
+    checkpoints = CheckpointStore(args.checkpoints) if args.checkpoints and command == "scrape" else None
+    try:
+        while True:
+            item = tasks.get()
+            if item is None:
+                break
+            position, value = item
+            request_id.set(f"cli-{index}-{position}")
+            results.put(run_one(pool, command, value, args, checkpoints))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown()
+        if checkpoints:
+            checkpoints.close()
+
+
+def print_summary(command, summary, elapsed, stream=sys.stderr):
+    processed = summary["success"] + summary["error"]
+    print(f"\n{command}: {processed} traités en {elapsed:.1f}s "
+          f"({summary['success']} réussis, {summary['error']} échecs, {summary['skipped']} déjà faits)", file=stream)
+    if processed:
+        print(f"  débit: {processed / elapsed * 60:.1f} entrées/min, "
+              f"{summary['seconds'] / processed:.2f}s en moyenne par entrée", file=stream)
+    if summary["contacts"]:
+        print(f"  contacts: {summary['contacts']}", file=stream)
+
+
+def main():
+    from accounts import load_accounts
+
+    parser = argparse.ArgumentParser(description="Bulk Apollo scraping: one input per line in, JSON lines out")
+    parser.add_argument("command", choices=sorted(OPERATIONS), help="scrape: company domains, email: profile URLs, people: names")
+    parser.add_argument("input", nargs="?", default="-", help="input file, one value per line (default: stdin)")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file the results are appended to")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="worker processes, one driver each")
+    parser.add_argument("--cookies", default=os.environ.get("APOLLO_COOKIES_FILE", "apollo_cookies.json"),
+                        help="cookies file, directory of cookies files or comma-separated list (one account each)")
+    parser.add_argument("--limit", type=int, help="contacts per domain (scrape) or people per name (people)")
+    parser.add_argument("--person-titles", nargs="+", help="job titles to search (scrape)")
+    parser.add_argument("--checkpoints", help="SQLite file for per-page scrape checkpoints (resume inside a domain)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="process every input even if the output already has it, and start scrapes over instead of resuming checkpoints")
+    args = parser.parse_args()
+
+    configure_logging()
+    inputs = read_inputs(args.input)
+    done = set() if args.no_resume else read_done(args.output)
+    pending = [value for value in inputs if value not in done]
+    summary = {"success": 0, "error": 0, "skipped": len(inputs) - len(pending), "seconds": 0.0, "contacts": 0}
+    if not pending:
+        print_summary(args.command, summary, 0)
+        return 0
+
+    accounts = load_accounts(args.cookies)
+    workers = max(1, min(args.workers, len(pending)))
+    tasks, results = multiprocessing.Queue(), multiprocessing.Queue()
+    for position, value in enumerate(pending):
+        tasks.put((position, value))
+    processes = []
+    for index in range(workers):
+        account = accounts[index % len(accounts)]
+        share = len(range(index % len(accounts), workers, len(accounts)))
+        tasks.put(None)
+        process = multiprocessing.Process(
+            target=worker_main, name=f"cli-{index}",
+            args=(index, account.cookies_file_path, share, args.command, args, tasks, results),
+        )
+        process.start()
+        processes.append(process)
+    logger.info("%s entrées à traiter (%s déjà faites) avec %s workers.", len(pending), summary["skipped"], workers)
+
+    start = time.perf_counter()
+    exit_code = 0
+    try:
+        with open(args.output, "a") as output:
+            remaining = len(pending)
+            while remaining:
+                try:
+                    record = results.get(timeout=5)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        logger.error("Tous les workers se sont arrêtés, %s entrées non traitées.", remaining)
+                        exit_code = 1
+                        break
+                    continue
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                remaining -= 1
+                summary[record["status"]] += 1
+                summary["seconds"] += record["seconds"]
+                if record["status"] == "success" and isinstance(record["result"], list):
+                    summary["contacts"] += len(record["result"])
+                if record["status"] == "error":
+                    logger.warning("Échec pour %s: %s", record["input"], record["error"])
+    except KeyboardInterrupt:
+        logger.warning("Interrompu: les résultats déjà écrits seront repris au prochain lancement.")
+        exit_code = 130
+        # Inputs not started yet are dropped: the next run picks them up from the input file
+        tasks.cancel_join_thread()
+    finally:
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+    print_summary(args.command, summary, time.perf_counter() - start)
+    return exit_code or (1 if summary["error"] else 0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+# jobs.py
+
+from telemetry import request_id
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 24 * 3600))
+
+
+class ScrapeJob:
+    """A batch of domains submitted together, with the status and result of each domain."""
+
+    def __init__(self, company_domains, force_refresh=False, person_titles=None, incremental=False):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at = None
+        self.force_refresh = force_refresh
+        self.person_titles = person_titles
+        self.incremental = incremental
+        self.cancelled = False
+        # dict.fromkeys removes duplicates while keeping the submission order
+        self.domains = {
+            domain: {"status": "queued", "contacts": None, "error": None}
+            for domain in dict.fromkeys(company_domains)
+        }
+
+    @property
+    def status(self):
+        statuses = [entry["status"] for entry in self.domains.values()]
+        if any(status in ("queued", "running") for status in statuses):
+            if self.cancelled:
+                return "cancelling"
+            return "running" if any(status != "queued" for status in statuses) else "queued"
+        return "cancelled" if self.cancelled else "done"
+
+    def to_dict(self, include_results=True):
+        counts = {}
+        for entry in self.domains.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "counts": counts,
+        }
+        if include_results:
+            job["domains"] = self.domains
+        return job
+
+
+class JobScheduler:
+    """
+    Works through the domains of submitted jobs with a fixed number of workers.
+
+    `scrape` is an async callable taking (company_domain, force_refresh,
+    person_titles, incremental) and returning the contacts, or None if scraping failed.
+    Running the scheduler with as many workers as there are scrapers keeps
+    the pool busy.
+    """
+
+    def __init__(self, scrape, concurrency):
+        self.jobs = {}
+        self._scrape = scrape
+        self._concurrency = concurrency
+        self._queue = None
+        self._workers = []
+
+    def start(self):
+        """Starts the workers. Must be called from the running event loop."""
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, company_domains, force_refresh=False, person_titles=None, incremental=False):
+        """Queues every domain of a new job and returns the job."""
+        self._prune()
+        job = ScrapeJob(company_domains, force_refresh, person_titles, incremental)
+        self.jobs[job.id] = job
+        for domain in job.domains:
+            self._queue.put_nowait((job, domain))
+        logger.info("Job %s submitted with %s domains.", job.id, len(job.domains))
+        return job
+
+    def cancel(self, job_id):
+        """Cancels the domains of a job that have not started yet. Returns the job, or None."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job.cancelled = True
+        for entry in job.domains.values():
+            if entry["status"] == "queued":
+                entry["status"] = "cancelled"
+        self._finish_if_done(job)
+        logger.info("Job %s cancelled.", job.id)
+        return job
+
+    def stats(self):
+        return {
+            "jobs": len(self.jobs),
+            "queued_domains": self._queue.qsize() if self._queue else 0,
+            "workers": len(self._workers),
+        }
+
+    async def _worker(self):
+        while True:
+            job, domain = await self._queue.get()
+            try:
+                entry = job.domains[domain]
+                if job.cancelled or entry["status"] != "queued":
+                    continue
+
+                entry["status"] = "running"
+                # Logs of this domain carry the job id (copied into the scraper thread by the pool)
+                request_id.set(f"job-{job.id}")
+                try:
+                    contacts = await self._scrape(domain, job.force_refresh, job.person_titles, job.incremental)
+                    if contacts is None:
+                        entry["status"] = "failed"
+                        entry["error"] = "Scraping failed. Check the API logs for more details."
+                    else:
+                        entry["status"] = "done"
+                        entry["contacts"] = contacts
+                except Exception as e:
+                    logger.error("Job %s: error while scraping %s: %s", job.id, domain, e)
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                self._finish_if_done(job)
+            finally:
+                self._queue.task_done()
+
+    def _finish_if_done(self, job):
+        if job.finished_at is None and job.status in ("done", "cancelled"):
+            job.finished_at = time.time()
+
+    def _prune(self):
+        """Forgets jobs that finished more than JOB_RETENTION seconds ago."""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and now - job.finished_at > JOB_RETENTION]:
+            del self.jobs[job_id]
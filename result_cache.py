@@ -0,0 +1,126 @@
+# result_cache.py
+
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.environ.get("CACHE_PATH", "apollo_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 10000))
+
+PROFILE_ID_PATTERN = re.compile(r"/people/([0-9a-zA-Z]+)")
+
+
+def normalize_domain(company_domain: str) -> str:
+    """Reduces 'https://www.Example.com/about' and friends to 'example.com'."""
+    domain = company_domain.strip().lower()
+    if "://" not in domain:
+        domain = f"//{domain}"
+    domain = urlparse(domain).hostname or ""
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+
+def scrape_cache_key(company_domain: str, person_titles=None):
+    """Cache key of a domain scrape: the normalized domain, plus the titles when they are not the default ones."""
+    key = normalize_domain(company_domain)
+    if person_titles is not None:
+        key += "|" + ",".join(sorted(title.strip().lower() for title in person_titles))
+    return key
+
+
+def profile_id_from_url(profile_url: str) -> str:
+    """Returns the Apollo person id of a profile URL, or the stripped URL if there is none."""
+    match = PROFILE_ID_PATTERN.search(profile_url)
+    return match.group(1) if match else profile_url.strip()
+
+
+class ResultCache:
+    """
+    SQLite-backed result cache with a per-lookup TTL and LRU eviction.
+
+    Entries are grouped by namespace (one per endpoint) and survive restarts.
+    Once more than `max_entries` rows are stored, the least recently read
+    ones are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, namespace, key, ttl=None):
+        """Returns the cached value, or None if it is missing or older than `ttl` seconds."""
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+
+            if row is None or (ttl is not None and now - row[1] > ttl):
+                if row is not None:
+                    self._connection.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+                self.misses[namespace] += 1
+                return None
+
+            self._connection.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+            self.hits[namespace] += 1
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value):
+        """Stores `value` (JSON-serializable) and evicts the least recently used entries if needed."""
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now, now),
+            )
+            self._connection.execute(
+                "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        """Returns the number of stored entries and the hit/miss counters per namespace."""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": {namespace: self.hits[namespace] for namespace in namespaces},
+            "misses": {namespace: self.misses[namespace] for namespace in namespaces},
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
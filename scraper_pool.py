@@ -0,0 +1,412 @@
+# scraper_pool.py
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import os
+import threading
+import time
+
+from accounts import load_accounts
+from apollo_scraper import ApolloScraper, FIREFOX_PROFILE_DIR, SessionExpiredError
+from telemetry import ACCOUNT_EVENTS, CALL_RETRIES, DRIVER_RECYCLES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", os.cpu_count() or 1))
+
+# A driver is replaced before its next call once it has served this many calls,
+# is this old (seconds) or uses this much memory (MB, Firefox and its content
+# processes). 0 disables a limit.
+DRIVER_MAX_JOBS = int(os.environ.get("DRIVER_MAX_JOBS", 200))
+DRIVER_MAX_AGE = int(os.environ.get("DRIVER_MAX_AGE", 4 * 3600))
+DRIVER_MAX_RSS_MB = int(os.environ.get("DRIVER_MAX_RSS_MB", 2048))
+
+# Longest a call may have to wait for an account (rate limit, throttling, email
+# credits) before it fails with NoAccountAvailableError, in seconds.
+ACCOUNT_MAX_WAIT = float(os.environ.get("ACCOUNT_MAX_WAIT", 60))
+
+# Marks the end of a stream produced by ScraperPool.stream
+_END_OF_STREAM = object()
+
+
+def process_tree_rss(pid):
+    """
+    Returns the resident memory, in bytes, of a process and all its descendants
+    (Firefox renders pages in child processes), or None if it cannot be read
+    (no /proc, process gone).
+    """
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+
+    children = defaultdict(list)
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children[ppid].append(int(entry))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            if current == pid:
+                return None
+            continue
+        pending.extend(children[current])
+    return total
+
+
+class NoAccountAvailableError(Exception):
+    """No account can serve the call soon enough (logged out, throttled or out of credits)."""
+
+
+class ScraperPool:
+    """
+    Pool of ApolloScraper workers, each owning its own Firefox driver.
+
+    `cookies` is a cookies file, a directory of cookies files or a
+    comma-separated list of them: one Apollo account each (see accounts.py).
+    Workers are spread over the accounts, every account getting at least one,
+    and each call goes to an idle worker of the least loaded account that is
+    logged in, not throttled, within its rate limit and, for email reveals,
+    within its credit budget.
+
+    A worker is checked out for the whole duration of a call, so two requests
+    never drive the same browser session. Calls made through `run` execute in
+    a thread executor and never block the event loop. They run in a copy of
+    the caller's context, so the request id follows them into the thread.
+
+    The pool also supervises the drivers: a driver that crashed is replaced,
+    an account whose session expired or that Apollo throttles is taken out of
+    rotation, and the call is retried once (on a fresh driver or another
+    account). Drivers are recycled after DRIVER_MAX_JOBS calls, DRIVER_MAX_AGE
+    seconds or DRIVER_MAX_RSS_MB of memory.
+    """
+
+    def __init__(self, cookies, size=None, profile_dir=FIREFOX_PROFILE_DIR):
+        self.accounts = load_accounts(cookies)
+        self.size = max(1, size or DEFAULT_POOL_SIZE, len(self.accounts))
+        self.workers = []
+        self.account_of = {}
+        for i in range(self.size):
+            account = self.accounts[i % len(self.accounts)]
+            # A Firefox profile can only be used by one browser at a time, and holds the session of one account
+            scraper = ApolloScraper(account.cookies_file_path, profile_dir=os.path.join(profile_dir, f"{account.name}-{i}") if profile_dir else None)
+            account.drivers += 1
+            self.workers.append(scraper)
+            self.account_of[scraper] = account
+        self._idle = list(self.workers)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="scraper")
+        self._lock = threading.Lock()
+        # Notified whenever a worker is returned to the pool
+        self._returned = threading.Condition(self._lock)
+        self._waiting = 0
+        self._queued = 0
+        self.warmed_up = 0
+        self.warm_up_done = False
+        self.recycles = defaultdict(int)
+        self.retries = 0
+
+    def _pick(self, operation):
+        """
+        Returns (scraper, None) with the idle scraper of the least loaded account
+        able to run `operation` now, or (None, seconds) with the time before an
+        idle worker's account becomes able to (None: wait for a worker to be
+        returned). Must be called under the lock.
+        """
+        if operation is None:
+            return (self._idle[0] if self._idle else None), None
+
+        waits = {account: account.unavailable_for(operation) for account in self.accounts}
+        if min(waits.values()) > ACCOUNT_MAX_WAIT:
+            raise NoAccountAvailableError(f"No Apollo account can run {operation}: {[account.stats() for account in self.accounts]}")
+        ready = [scraper for scraper in self._idle if waits[self.account_of[scraper]] == 0]
+        if ready:
+            return min(ready, key=lambda scraper: self.account_of[scraper].load()), None
+        # Logged-out accounts never become available: their idle workers are not waited for
+        return None, min((waits[self.account_of[scraper]] for scraper in self._idle
+                          if waits[self.account_of[scraper]] != math.inf), default=None)
+
+    @contextmanager
+    def checkout(self, operation=None, timeout=None):
+        """
+        Borrows a scraper for the duration of the `with` block. With `operation`
+        (the scraper method about to run), the scraper is chosen by account and
+        the account's rate limit and email credits are spent.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._returned:
+            self._waiting += 1
+            try:
+                while True:
+                    scraper, wait = self._pick(operation)
+                    if scraper is not None:
+                        break
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("No scraper worker available.")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._returned.wait(wait)
+            finally:
+                self._waiting -= 1
+            account = self.account_of[scraper]
+            self._idle.remove(scraper)
+            account.in_flight += 1
+            if operation is not None:
+                account.reserve(operation)
+
+        try:
+            yield scraper
+        finally:
+            with self._returned:
+                self._idle.append(scraper)
+                account.in_flight -= 1
+                self._returned.notify_all()
+
+    def recycle_reason(self, scraper):
+        """Returns why a scraper's driver should be replaced before its next call, or None."""
+        if scraper.driver is None:
+            return None
+        if not scraper.is_driver_alive():
+            return "crash"
+        if DRIVER_MAX_JOBS and scraper.jobs_since_start >= DRIVER_MAX_JOBS:
+            return "jobs"
+        if DRIVER_MAX_AGE and time.monotonic() - scraper.driver_started_at >= DRIVER_MAX_AGE:
+            return "age"
+        if DRIVER_MAX_RSS_MB and scraper.browser_pid():
+            rss = process_tree_rss(scraper.browser_pid())
+            if rss is not None and rss >= DRIVER_MAX_RSS_MB * 1024 * 1024:
+                return "memory"
+        return None
+
+    def failure_reason(self, scraper, error=None):
+        """
+        After a failed call, returns "crash", "logged_out" or "throttled" if the
+        driver or its account is to blame, else None.
+        """
+        if scraper.driver is None:
+            return None
+        if not scraper.is_driver_alive():
+            return "crash"
+        if isinstance(error, SessionExpiredError) or scraper.is_logged_out():
+            return "logged_out"
+        if scraper.is_throttled():
+            return "throttled"
+        return None
+
+    def handle_failure(self, scraper, reason):
+        """Recycles the driver and/or takes its account out of rotation after a failure."""
+        account = self.account_of[scraper]
+        if reason in ("logged_out", "throttled"):
+            with self._lock:
+                if reason == "logged_out":
+                    account.mark_logged_out()
+                else:
+                    account.mark_throttled()
+            ACCOUNT_EVENTS.labels(account.name, reason).inc()
+            logger.warning("Compte %s retiré de la rotation (%s).", account.name, reason)
+        if reason in ("crash", "logged_out"):
+            self.recycle(scraper, reason)
+
+    def recycle(self, scraper, reason):
+        """Quits a scraper's driver; its next call starts a fresh one."""
+        if reason == "logged_out" and scraper.is_driver_alive():
+            try:
+                # Sinon le profil persistant garderait la session expirée et les cookies ne seraient pas réinjectés
+                scraper.driver.delete_all_cookies()
+            except Exception:
+                pass
+        scraper.quit_driver()
+        with self._lock:
+            self.recycles[reason] += 1
+        DRIVER_RECYCLES.labels(reason).inc()
+        logger.warning("Driver recyclé (%s).", reason)
+
+    def _prepare(self, scraper):
+        reason = self.recycle_reason(scraper)
+        if reason:
+            self.recycle(scraper, reason)
+
+    def _supervised_call(self, scraper, method_name, *args, **kwargs):
+        """
+        Runs a scraper method, replacing the driver first if it is due. Returns
+        (result, None, None), or (result, reason, error) if the call failed
+        (exception, or None from scrape_apollo) because of the driver or its
+        account; other exceptions are raised.
+        """
+        self._prepare(scraper)
+        error = None
+        try:
+            result = getattr(scraper, method_name)(*args, **kwargs)
+            failure = self.failure_reason(scraper) if result is None else None
+        except Exception as e:
+            failure = self.failure_reason(scraper, e)
+            if failure is None:
+                raise
+            result, error = None, e
+        finally:
+            scraper.jobs_since_start += 1
+        if failure:
+            self.handle_failure(scraper, failure)
+        return result, failure, error
+
+    def _can_retry(self, method_name):
+        """True if an account will be able to run `method_name` within ACCOUNT_MAX_WAIT."""
+        with self._lock:
+            return min(account.unavailable_for(method_name) for account in self.accounts) <= ACCOUNT_MAX_WAIT
+
+    def _call(self, method_name, *args, **kwargs):
+        """
+        Runs a call, and retries it once (fresh driver or another account) if
+        the driver or account failed. When no account can take the retry (the
+        only account is throttled or logged out), the original error is raised.
+        """
+        with self._lock:
+            self._queued -= 1
+        for attempt in range(2):
+            with self.checkout(method_name) as scraper:
+                result, failure, error = self._supervised_call(scraper, method_name, *args, **kwargs)
+            if failure is None:
+                return result
+            if attempt == 0 and not self._can_retry(method_name):
+                logger.warning("Pas de nouvelle tentative de %s après un échec (%s): aucun compte disponible.", method_name, failure)
+                break
+            if attempt == 0:
+                with self._lock:
+                    self.retries += 1
+                CALL_RETRIES.inc()
+                logger.warning("Nouvelle tentative de %s après un échec (%s).", method_name, failure)
+        if error is not None:
+            raise error
+        return result
+
+    def call(self, method_name, *args, **kwargs):
+        """Blocking version of `run`, for callers without an event loop (the bulk CLI)."""
+        with self._lock:
+            self._queued += 1
+        return self._call(method_name, *args, **kwargs)
+
+    async def run(self, method_name, *args, **kwargs):
+        """Runs `ApolloScraper.<method_name>` on a free worker without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._queued += 1
+        call = functools.partial(self._call, method_name, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, contextvars.copy_context().run, call)
+
+    async def stream(self, method_name, *args, **kwargs):
+        """
+        Iterates over the generator `ApolloScraper.<method_name>` on a free worker
+        and yields its items as they are produced. The worker is held until the
+        generator is exhausted or the consumer stops iterating.
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            with self._lock:
+                self._queued -= 1
+            try:
+                with self.checkout(method_name) as scraper:
+                    # Items may already have been sent, so a failed stream is not retried
+                    self._prepare(scraper)
+                    generator = getattr(scraper, method_name)(*args, **kwargs)
+                    try:
+                        for item in generator:
+                            loop.call_soon_threadsafe(items.put_nowait, (item, None))
+                            if stop.is_set():
+                                break
+                    except Exception as e:
+                        failure = self.failure_reason(scraper, e)
+                        if failure:
+                            self.handle_failure(scraper, failure)
+                        raise
+                    finally:
+                        generator.close()
+                        scraper.jobs_since_start += 1
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, (_END_OF_STREAM, e))
+            else:
+                loop.call_soon_threadsafe(items.put_nowait, (_END_OF_STREAM, None))
+
+        with self._lock:
+            self._queued += 1
+        loop.run_in_executor(self._executor, contextvars.copy_context().run, produce)
+        try:
+            while True:
+                item, error = await items.get()
+                if item is _END_OF_STREAM:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    async def warm_up(self):
+        """Starts every driver in parallel so the first requests do not pay for it."""
+        def warm_up_worker():
+            with self._lock:
+                self._queued -= 1
+            with self.checkout() as scraper:
+                scraper.warm_up()
+            with self._lock:
+                self.warmed_up += 1
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._queued += self.size
+        results = await asyncio.gather(
+            *[loop.run_in_executor(self._executor, warm_up_worker) for _ in range(self.size)],
+            return_exceptions=True,
+        )
+        for error in results:
+            if isinstance(error, Exception):
+                logger.error("Échec du démarrage d'un driver: %s", error)
+        self.warm_up_done = True
+        logger.info("%s/%s drivers prêts.", self.warmed_up, self.size)
+
+    def stats(self):
+        """Returns the pool size and how many calls are running or waiting for a worker."""
+        with self._lock:
+            idle = len(self._idle)
+            waiting = self._waiting + self._queued
+            accounts = [account.stats() for account in self.accounts]
+        return {
+            "pool_size": self.size,
+            "idle": idle,
+            "busy": self.size - idle,
+            "queue_depth": waiting,
+            "warmed_up": self.warmed_up,
+            "active_drivers": sum(1 for scraper in self.workers if scraper.driver is not None),
+            "driver_recycles": dict(self.recycles),
+            "driver_crashes": self.recycles.get("crash", 0),
+            "retries": self.retries,
+            "accounts": accounts,
+        }
+
+    def shutdown(self):
+        """Stops the executor and closes every driver."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for scraper in self.workers:
+            scraper.quit_driver()
@@ -0,0 +1,95 @@
+# telemetry.py
+
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram
+
+import contextvars
+import json
+import logging
+import os
+import time
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# "text" for humans, "json" for one JSON object per line (log collectors)
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+
+# Id of the API request or batch job being served, attached to every log record.
+# ScraperPool copies it into its worker threads.
+request_id = contextvars.ContextVar("request_id", default="-")
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = Histogram(
+    "apollo_stage_seconds", "Duration of each scraping stage, in seconds", ["operation", "stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 60, 120),
+)
+PAGES_PER_SCRAPE = Histogram(
+    "apollo_pages_per_scrape", "Results pages read per domain scrape",
+    buckets=(1, 2, 3, 4, 5, 8, 10, 20),
+)
+CONTACTS_PER_PAGE = Histogram(
+    "apollo_contacts_per_page", "Contacts kept per results page",
+    buckets=(0, 1, 5, 10, 15, 20, 25),
+)
+FAILURES = Counter("apollo_failures_total", "Failed scraper operations, by page state at the time of failure", ["operation", "page_state"])
+SCREENSHOTS = Counter("apollo_screenshots_total", "Screenshots taken after an error", ["operation"])
+DRIVER_RECYCLES = Counter("apollo_driver_recycles_total", "Drivers replaced, by reason (crash, logged_out, jobs, age, memory)", ["reason"])
+ACCOUNT_EVENTS = Counter("apollo_account_events_total", "Accounts taken out of rotation, by account and reason (logged_out, throttled)", ["account", "reason"])
+CALL_RETRIES = Counter("apollo_call_retries_total", "Calls retried on a fresh driver after a crash or an expired session")
+REQUEST_SECONDS = Histogram("apollo_http_request_seconds", "API request duration, in seconds", ["method", "path", "status"])
+ACTIVE_DRIVERS = Gauge("apollo_active_drivers", "Scraper workers with a running Firefox driver")
+BUSY_WORKERS = Gauge("apollo_busy_workers", "Scraper workers currently checked out")
+QUEUE_DEPTH = Gauge("apollo_queue_depth", "Calls waiting for a scraper worker")
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the current request id to every record as `request_id`."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record. Fields passed as `extra={"fields": {...}}` are merged in."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """Sends every log record to stderr with its level and request id."""
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+@contextmanager
+def span(operation, stage, **fields):
+    """Times the `with` block into STAGE_SECONDS and logs its duration at DEBUG level."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(operation, stage).observe(elapsed)
+        logger.debug(
+            "%s/%s: %.3fs", operation, stage, elapsed,
+            extra={"fields": {"operation": operation, "stage": stage, "duration": round(elapsed, 4), **fields}},
+        )
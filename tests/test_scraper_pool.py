@@ -0,0 +1,36 @@
+# tests/test_scraper_pool.py
+
+import threading
+
+from scraper_pool import ScraperPool
+
+
+def make_pool(tmp_path, account_names):
+    """A pool with one worker per account. Drivers are started lazily, so none is started here."""
+    for name in account_names:
+        (tmp_path / f"{name}.json").write_text("[]")
+    return ScraperPool(str(tmp_path), size=len(account_names), profile_dir=None)
+
+
+def test_checkout_waits_for_a_healthy_worker_when_an_account_is_logged_out(tmp_path):
+    pool = make_pool(tmp_path, ["a", "b"])
+    logged_out, healthy = pool.accounts
+    logged_out.mark_logged_out()
+    checked_out = []
+
+    with pool.checkout("scrape_apollo") as scraper:
+        assert pool.account_of[scraper] is healthy
+
+        def checkout_next():
+            with pool.checkout("scrape_apollo") as next_scraper:
+                checked_out.append(next_scraper)
+
+        # Only the logged-out account's worker is idle: the call must queue instead of failing
+        waiter = threading.Thread(target=checkout_next)
+        waiter.start()
+        waiter.join(timeout=0.2)
+        assert waiter.is_alive()
+
+    waiter.join(timeout=5)
+    assert checked_out == [scraper]
+    pool.shutdown()